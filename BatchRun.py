@@ -0,0 +1,183 @@
+#Functions for processing every stage of a G_FRAC run at once
+#Each stage of each sample is an independent unit of work that is handed to a worker process
+#Errors in one stage are collected and reported without stopping the others
+
+import FileIndex
+import Profiler
+import RunManifest
+import concurrent.futures
+import logging
+import os
+import traceback
+
+LOG_NAMES = ["PltParser", "DomLine", "DomPoly", "PlotStage", "BatchRun"] #Loggers of this project, see setupLogging
+
+logger = logging.getLogger(__name__)
+
+def setupLogging(logLevel):
+	#Sends the logging of this project to stderr at logLevel
+	#Everything else stays at warnings so turning on debugging does not also turn it on for matplotlib
+	logging.basicConfig(level = logging.WARNING, format = "%(name)s: %(message)s")
+	for name in LOG_NAMES:
+		logging.getLogger(name).setLevel(logLevel)
+
+def initWorker(logLevel = None):
+	#Workers never show anything, so they use the non-interactive backend
+	#logLevel is passed on since a spawned worker does not inherit the logging setup of the main process
+	from PlotStage import useAgg
+	useAgg()
+	if logLevel is not None:
+		setupLogging(logLevel)
+
+def runStage(stageNum, inputDir, outputDir, cacheDir = None, formats = None, sampleName = None, engine = None, numError = 0, areaMin = None, fillOp = None, renderer = None, parts = None):
+	#Plots the isopleths and phase diagram of one stage of one sample
+	#formats is the list of figure file extensions, None uses the PlotStage default
+	#engine is the phase field method, None uses the PltParser default
+	#numError is passed to plotIsos, areaMin and fillOp to plotPhase and renderer to both, None uses the PlotStage defaults
+	#parts is the list of RunManifest.STAGE_PARTS to make, None makes all of them
+	#Returns (error, profile records), error is None if it worked or the traceback as a string if it did not
+	#and the records are the Profiler timings of this stage
+	from PlotStage import PlotStage
+	params = stageParams(formats, engine, numError, areaMin, fillOp, renderer)
+	if parts is None:
+		parts = RunManifest.STAGE_PARTS
+	Profiler.reset()
+	stageError = None
+	try:
+		with Profiler.timePhase("stage"):
+			thisStage = PlotStage(stageNum, inputDir, cacheDir = cacheDir, sampleName = sampleName)
+			if len(thisStage.pltList) == 0:
+				stageError = "Does not contain stage " + str(stageNum)
+			else:
+				os.makedirs(outputDir, exist_ok = True)
+				if RunManifest.STAGE_PARTS[0] in parts:
+					thisStage.plotIsos(outputDir, numError = params["isos"]["numError"], formats = params["isos"]["formats"], renderer = params["isos"]["renderer"])
+				if RunManifest.STAGE_PARTS[1] in parts:
+					phaseParams = params["phase"]
+					thisStage.plotPhase(outputDir, formats = phaseParams["formats"], engine = phaseParams["engine"], areaMin = phaseParams["areaMin"], fillOp = phaseParams["fillOp"], renderer = phaseParams["renderer"])
+	except BaseException:
+		#BaseException as well because PltParser and PlotStage call exit() when a file cant be opened
+		stageError = traceback.format_exc()
+	return stageError, Profiler.getRecords()
+
+def stageParams(formats = None, engine = None, numError = 0, areaMin = None, fillOp = None, renderer = None):
+	#Returns the settings each part of a stage is made with, with the defaults filled in
+	#Everything that can change the output of a part is in here so the RunManifest can tell when it has to be made again
+	from PlotStage import FIG_FORMATS, AREA_MIN, RENDERERS
+	from PltParser import POLY_ENGINES, DIST_THRESH, TOPO_TOL
+	from DomLine import T_THRESH, P_THRESH, EQ_THRESH, EXTRAP_RATIO
+	from DomPoly import FILL_OPTIONS
+	if formats is None:
+		formats = FIG_FORMATS
+	if engine is None:
+		engine = POLY_ENGINES[0]
+	if areaMin is None:
+		areaMin = AREA_MIN
+	if fillOp is None:
+		fillOp = FILL_OPTIONS[0]
+	if renderer is None:
+		renderer = RENDERERS[0]
+	thresholds = {"T_THRESH": T_THRESH, "P_THRESH": P_THRESH, "EQ_THRESH": EQ_THRESH}
+	return {
+		RunManifest.STAGE_PARTS[0]: {"formats": list(formats), "renderer": renderer, "numError": numError, "thresholds": thresholds},
+		RunManifest.STAGE_PARTS[1]: {"formats": list(formats), "renderer": renderer, "engine": engine, "areaMin": areaMin, "fillOp": fillOp,
+			"thresholds": dict(thresholds, DIST_THRESH = DIST_THRESH, EXTRAP_RATIO = EXTRAP_RATIO, TOPO_TOL = TOPO_TOL)}}
+
+def stageEntries(fileDir, sampleName, stageNum, params, cacheDir = None):
+	#Returns {part: RunManifest entry} for one stage as it would be made now
+	#The phase diagram also depends on the first isopleth file, its axes are used for the figure
+	from PlotStage import GRT_CODES, PHASE_CODE
+	sampleName, stageFiles = FileIndex.getStageFiles(fileDir, stageNum, sampleName, manifestDir = cacheDir)
+	isoFiles = [stageFiles[code] for code in GRT_CODES if code in stageFiles]
+	phaseFiles = isoFiles[:1]
+	if PHASE_CODE in stageFiles:
+		phaseFiles = [stageFiles[PHASE_CODE]] + phaseFiles
+	isoOutputs = [FileIndex.isoFigName(sampleName, stageNum, figFormat) for figFormat in params["isos"]["formats"]]
+	phaseOutputs = [FileIndex.phaseFigName(sampleName, stageNum, figFormat) for figFormat in params["phase"]["formats"]]
+	phaseOutputs.append(FileIndex.phaseListName(sampleName, stageNum))
+	return {
+		RunManifest.STAGE_PARTS[0]: RunManifest.makeEntry(isoFiles, params["isos"], isoOutputs),
+		RunManifest.STAGE_PARTS[1]: RunManifest.makeEntry(phaseFiles, params["phase"], phaseOutputs)}
+
+def runBatch(inputDir, outputDir, numWorkers = None, cacheDir = None, stages = None, formats = None, recursive = False, engine = None, logLevel = None, profilePath = None,
+		numError = 0, areaMin = None, fillOp = None, renderer = None, force = False):
+	#Processes every stage of every sample in inputDir with a pool of numWorkers processes (one per core by default)
+	#If recursive is True every directory under inputDir is included and its output goes to the same relative path under outputDir
+	#If stages is given only the stage numbers in it are processed
+	#logLevel sets up logging in the worker processes, None leaves them as they are
+	#If profilePath is given the Profiler timings of every stage are saved there as json
+	#A RunManifest in outputDir records what every stage was made from, parts of a stage that are up to date are skipped
+	#unless force is True
+	#Returns a dictionary of (fileDir, sampleName, stageNum) to error message for the units that failed
+	units = FileIndex.findUnits(inputDir, recursive, cacheDir)
+	errors = {}
+	if stages is not None:
+		foundStages = set(stageNum for fileDir, sampleName, stageNum in units)
+		for stageNum in stages:
+			if stageNum not in foundStages:
+				errors[(inputDir, None, stageNum)] = "Does not contain stage " + str(stageNum)
+		units = [unit for unit in units if unit[2] in stages]
+
+	params = stageParams(formats, engine, numError, areaMin, fillOp, renderer)
+	manifest = RunManifest.loadManifest(outputDir)
+	jobs = {}
+	newEntries = {}
+	for unit in units:
+		fileDir, sampleName, stageNum = unit
+		relDir = os.path.relpath(fileDir, inputDir)
+		unitOutput = os.path.normpath(os.path.join(outputDir, relDir))
+		key = RunManifest.unitKey(relDir, sampleName, stageNum)
+		try:
+			newEntries[unit] = stageEntries(fileDir, sampleName, stageNum, params, cacheDir)
+		except Exception:
+			#A plt file that went missing or cant be read only stops this stage
+			errors[unit] = traceback.format_exc()
+			continue
+		oldEntries = manifest.get(key, {})
+		parts = [part for part in RunManifest.STAGE_PARTS if force or not RunManifest.isFresh(oldEntries.get(part), newEntries[unit][part], unitOutput)]
+		if len(parts) == 0:
+			logger.info("%s Stage %s in %s is up to date", sampleName, stageNum, fileDir)
+			continue
+		jobs[unit] = {"stageNum": stageNum, "inputDir": fileDir, "outputDir": unitOutput, "cacheDir": cacheDir, "formats": formats, "sampleName": sampleName,
+			"engine": engine, "numError": numError, "areaMin": areaMin, "fillOp": fillOp, "renderer": renderer, "parts": parts}
+
+	profileRecords = []
+	def addResult(unit, unitError, unitRecords):
+		fileDir, sampleName, stageNum = unit
+		key = RunManifest.unitKey(os.path.relpath(fileDir, inputDir), sampleName, stageNum)
+		unitEntries = manifest.setdefault(key, {})
+		for part in jobs[unit]["parts"]:
+			if unitError is None:
+				unitEntries[part] = newEntries[unit][part]
+			else:
+				unitEntries.pop(part, None)
+		if unitError is not None:
+			errors[unit] = unitError
+		for record in unitRecords:
+			record.update({"dir": fileDir, "sample": sampleName, "stage": stageNum})
+			profileRecords.append(record)
+
+	if numWorkers == 1:
+		#Run in this process, useful for debugging
+		for unit in jobs:
+			addResult(unit, *runStage(**jobs[unit]))
+	elif len(jobs) > 0:
+		with concurrent.futures.ProcessPoolExecutor(max_workers = numWorkers, initializer = initWorker, initargs = (logLevel,)) as pool:
+			futures = {}
+			for unit in jobs:
+				futures[pool.submit(runStage, **jobs[unit])] = unit
+			for future in concurrent.futures.as_completed(futures):
+				unit = futures[future]
+				try:
+					unitError, unitRecords = future.result()
+				except Exception:
+					#The worker itself died
+					unitError, unitRecords = traceback.format_exc(), []
+				addResult(unit, unitError, unitRecords)
+
+	if len(jobs) > 0:
+		RunManifest.saveManifest(outputDir, manifest)
+	if profilePath is not None:
+		profileRecords.sort(key = lambda record: (record["dir"], record["sample"], record["stage"], record["phase"], record["file"] or ""))
+		Profiler.writeJson(profilePath, profileRecords)
+	return errors
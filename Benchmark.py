@@ -0,0 +1,299 @@
+#Benchmarks for the parse, join, field building and plotting of a stage
+#Synthetic domino runs are written in the same plt format theriak-domino produces and then processed at growing sizes
+#The phase diagram is a grid of fields, every grid edge is a reaction line split into fragments that joinLines has to put back together
+#Phase line fragments are kept well over the join tolerance, and every run is checked for the number of joined lines and fields the generator made
+#The isopleth files are sets of slanted lines, also split into fragments, with a garnet in line ("N") along the bottom
+#
+#The time to import the main modules in a fresh interpreter is measured as well, along with whether that loads matplotlib
+#and so is the time DomLine.extrapIntersecMany takes against calling extrapIntersec on every pair, for lines of a few lengths
+#
+#Run with e.g. python Benchmark.py --scales 1,2,4 --repeat 3
+#Results are printed and written to bench_output.txt
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+import DomLine
+import Profiler
+from DomLine import T_THRESH, P_THRESH
+from PltParser import POLY_ENGINES
+from PlotStage import PlotStage, RENDERERS, useAgg
+
+SAMPLE_NAME = "BENCH"
+T_RANGE = (450.0, 650.0)
+P_RANGE = (2000.0, 12000.0)
+ISO_MEMBERS = ["alm", "gr", "py", "spss"]
+PHASE_MEMBER = "Phase"
+FRAGMENT_MARGIN = 3 #Phase line fragments are at least this many times T_THRESH and P_THRESH long, shorter ones get joined at the wrong ends
+PTS_PER_ROW = 7 #Number of T P flag triplets on each row of a block, as in the domino output
+BENCH_PHASES = ["parse", "join", "getPolys", "sortLines", "DomPoly", "plotIsos", "plotPhase", "savefig", "stage"] #Profiler phases reported
+BENCH_OUTPUT = "bench_output.txt"
+IMPORT_MODULES = ["PltParser", "PlotStage", "SvgWriter", "BatchRun", "matplotlib.pyplot"] #Modules whose import time is reported
+#Run in a fresh interpreter, prints the seconds taken and whether matplotlib was loaded
+EXTRAP_POINTS = "2,10,50,1000" #Line lengths the extrapolated intersections are timed at
+EXTRAP_PAIRS = 500 #Pairs of lines timed at each length
+IMPORT_SCRIPT = "import sys, time\nstart = time.perf_counter()\nimport %s\nprint(time.perf_counter() - start, 'matplotlib' in sys.modules)"
+
+def _formatNum(value):
+	return "%20.12E" % value
+
+def _labelRow(pt, label):
+	#The two label rows after the points of a block, the label is glued to the last flag
+	return _formatNum(pt[0]) + _formatNum(pt[1]) + " 0.0000000    0.0000    0" + label + "\n"
+
+def writePlt(fileName, blocks, metadata = ()):
+	#Writes a plt file with one block for every (ptArray, leftSide, rightSide) in blocks
+	#rightSide can be None for isopleths
+	with open(fileName, "w") as pltFile:
+		pltFile.write("L:Temperature [C]".ljust(80) + "\n")
+		pltFile.write("Pressure [Bar]".ljust(80) + "\n")
+		pltFile.write("".join(_formatNum(value) for value in (T_RANGE[0], T_RANGE[1], P_RANGE[0], P_RANGE[1])) + "     15.00     15.00\n")
+		pltFile.write("%5d    0    0    0    0    0\n" % len(metadata))
+		for text in metadata:
+			pltFile.write(_formatNum(T_RANGE[0]) + _formatNum(P_RANGE[0]) + " 0.2000000    0.0000    0" + text + "\n")
+		for ptArray, leftSide, rightSide in blocks:
+			pltFile.write("    2%5d    0    0    0    0    0\n" % len(ptArray))
+			for rowStart in range(0, len(ptArray), PTS_PER_ROW):
+				row = ""
+				for i in range(rowStart, min(rowStart + PTS_PER_ROW, len(ptArray))):
+					flag = 3 if i == 0 else 2
+					row += _formatNum(ptArray[i][0]) + _formatNum(ptArray[i][1]) + " " + str(flag)
+				pltFile.write(row + "\n")
+			#Domino puts the label points just either side of the first point
+			pltFile.write(_labelRow((ptArray[0][0] - 0.0667, ptArray[0][1]), leftSide))
+			pltFile.write(_labelRow((ptArray[0][0] + 0.0667, ptArray[0][1]), rightSide or ""))
+
+def makeLine(start, end, numPoints, wiggle, rng):
+	#numPoints points from start to end with a small sideways wiggle that is zero at both ends
+	along = np.linspace(0, 1, numPoints)
+	pts = np.outer(1 - along, start) + np.outer(along, end)
+	direction = np.array(end, dtype = float) - start
+	normal = np.array([-direction[1], direction[0]])/max(np.hypot(*direction), 1e-12)
+	scale = np.array([T_RANGE[1] - T_RANGE[0], P_RANGE[1] - P_RANGE[0]])
+	offset = wiggle*np.sin(np.pi*along)*rng.uniform(-1, 1)
+	return pts + np.outer(offset, normal*scale)
+
+def splitLine(pts, numFragments, rng):
+	#Splits a line into numFragments pieces that share their end points, some of them reversed
+	#so joinLines has to work out the orientation
+	cuts = np.linspace(0, len(pts) - 1, numFragments + 1).round().astype(int)
+	fragments = []
+	for i in range(numFragments):
+		fragment = pts[cuts[i]:cuts[i+1] + 1]
+		if len(fragment) < 2:
+			continue
+		if rng.random() < 0.5:
+			fragment = fragment[::-1]
+		fragments.append(fragment)
+	return fragments
+
+def _fieldName(row, col):
+	#Every field has to keep "gph" to pass the graphite filter of PltParser
+	return "FLUID3 F" + str(row) + "x" + str(col) + " q gph"
+
+def makePhaseBlocks(gridSize, numPoints, numFragments, rng):
+	#A gridSize by gridSize grid of fields, every internal grid edge is a reaction between the two fields either side of it
+	tNodes = np.linspace(T_RANGE[0], T_RANGE[1], gridSize + 1)
+	pNodes = np.linspace(P_RANGE[0], P_RANGE[1], gridSize + 1)
+	blocks = []
+	for col in range(1, gridSize):
+		for row in range(gridSize):
+			pts = makeLine((tNodes[col], pNodes[row]), (tNodes[col], pNodes[row + 1]), numPoints, 0.005, rng)
+			for fragment in splitLine(pts, numFragments, rng):
+				blocks.append((fragment, _fieldName(row, col - 1), _fieldName(row, col)))
+	for row in range(1, gridSize):
+		for col in range(gridSize):
+			pts = makeLine((tNodes[col], pNodes[row]), (tNodes[col + 1], pNodes[row]), numPoints, 0.005, rng)
+			for fragment in splitLine(pts, numFragments, rng):
+				blocks.append((fragment, _fieldName(row - 1, col), _fieldName(row, col)))
+	return blocks
+
+def makeIsoBlocks(numIsopleths, numPoints, numFragments, rng):
+	#numIsopleths slanted isopleths across the plot plus a garnet in line along the bottom
+	blocks = []
+	tSpan = T_RANGE[1] - T_RANGE[0]
+	for i in range(numIsopleths):
+		tStart = T_RANGE[0] + tSpan*(i + 1)/(numIsopleths + 2)
+		pts = makeLine((tStart, P_RANGE[0]), (tStart + tSpan/(numIsopleths + 2), P_RANGE[1]), numPoints, 0.01, rng)
+		label = "%.4f" % (0.1 + 0.01*i)
+		for fragment in splitLine(pts, numFragments, rng):
+			blocks.append((fragment, label, None))
+	pts = makeLine((T_RANGE[0], P_RANGE[0] + 500), (T_RANGE[1], P_RANGE[0] + 500), numPoints, 0.01, rng)
+	for fragment in splitLine(pts, numFragments, rng):
+		blocks.append((fragment, "N", None))
+	return blocks
+
+def makeStage(fileDir, stageNum, numIsopleths, numPoints, numFragments, gridSize, phaseFragments = None, seed = 0):
+	#Writes the five plt files of one synthetic stage to fileDir
+	#The isopleths are split into numFragments and the phase lines into phaseFragments (numFragments by default)
+	if phaseFragments is None:
+		phaseFragments = numFragments
+	rng = np.random.default_rng(seed)
+	prefix = os.path.join(fileDir, SAMPLE_NAME + "_Stage" + "%02d" % stageNum + "_")
+	for member in ISO_MEMBERS:
+		writePlt(prefix + member + ".plt", makeIsoBlocks(numIsopleths, numPoints, numFragments, rng))
+	writePlt(prefix + PHASE_MEMBER + ".plt", makePhaseBlocks(gridSize, numPoints, phaseFragments, rng), metadata = ["database: synthetic"])
+
+def scaleSize(scale):
+	#Generator settings for one size of the benchmark
+	#The grid cells shrink as the grid grows, so the phase lines are split into fewer fragments than the isopleths
+	#once a fragment would get shorter than FRAGMENT_MARGIN times the join tolerance
+	gridSize = scale + 2
+	cellFragments = min((T_RANGE[1] - T_RANGE[0])/(gridSize*FRAGMENT_MARGIN*T_THRESH), (P_RANGE[1] - P_RANGE[0])/(gridSize*FRAGMENT_MARGIN*P_THRESH))
+	return {"numIsopleths": 5*scale, "numPoints": 20*scale, "numFragments": scale + 1, "gridSize": gridSize,
+		"phaseFragments": max(1, min(scale + 1, int(cellFragments)))}
+
+def checkStage(thisStage, size):
+	#Compares the joined lines and fields of a processed stage with what makeStage wrote
+	#Returns a list of problems, empty if everything was put back together
+	problems = []
+	for member in thisStage.pltList:
+		if len(member.domLines) != size["numIsopleths"] + 1:
+			problems.append("%s: %d joined isopleths, expected %d" % (os.path.basename(member.fileName), len(member.domLines), size["numIsopleths"] + 1))
+	gridSize = size["gridSize"]
+	phasePlt = thisStage.phasePlt
+	if len(phasePlt.domLines) != 2*gridSize*(gridSize - 1):
+		problems.append("%d joined phase lines, expected %d" % (len(phasePlt.domLines), 2*gridSize*(gridSize - 1)))
+	numCrossed = sum(not line.PTline.is_simple for line in phasePlt.domLines)
+	if numCrossed > 0:
+		problems.append("%d joined phase lines cross themselves" % numCrossed)
+	if len(phasePlt.polyList) != gridSize*gridSize or len(phasePlt.failedPolys) > 0:
+		problems.append("%d fields and %d failed fields, expected %d fields" % (len(phasePlt.polyList), len(phasePlt.failedPolys), gridSize*gridSize))
+	return problems
+
+def runSize(size, repeat = 1, engine = POLY_ENGINES[0], renderer = None):
+	#Makes a stage of the given size and processes it repeat times
+	#renderer is passed to plotIsos and plotPhase, None uses the PlotStage default
+	#Returns the best time of each benchmark phase over the repeats and the problems checkStage found in the first run
+	if renderer is None:
+		renderer = RENDERERS[0]
+	best = {}
+	problems = []
+	workDir = tempfile.mkdtemp(prefix = "frac_bench_")
+	try:
+		makeStage(workDir, 0, **size)
+		saveDir = os.path.join(workDir, "out")
+		os.makedirs(saveDir)
+		for i in range(repeat):
+			Profiler.reset()
+			with Profiler.timePhase("stage"):
+				thisStage = PlotStage(0, workDir)
+				thisStage.plotIsos(saveDir, renderer = renderer)
+				thisStage.plotPhase(saveDir, engine = engine, renderer = renderer)
+			if i == 0:
+				problems = checkStage(thisStage, size)
+			totals = Profiler.summarize(Profiler.getRecords())
+			for phaseName in BENCH_PHASES:
+				seconds = totals.get(phaseName, {"seconds": 0.0})["seconds"]
+				best[phaseName] = min(best.get(phaseName, seconds), seconds)
+	finally:
+		shutil.rmtree(workDir, ignore_errors = True)
+	return best, problems
+
+def makeExtrapPairs(numPairs, numPoints, rng):
+	#numPairs pairs of lines of numPoints points each, wandering from random points inside the plot
+	scale = np.array([T_RANGE[1] - T_RANGE[0], P_RANGE[1] - P_RANGE[0]])
+	pairs = []
+	for i in range(numPairs):
+		pair = []
+		for j in range(2):
+			start = np.array([T_RANGE[0], P_RANGE[0]]) + rng.uniform(0.2, 0.8, 2)*scale
+			steps = (rng.normal(0, 1, (numPoints - 1, 2))/numPoints + rng.normal(0, 0.01, 2))*scale
+			line = DomLine.DomLine(coords = np.concatenate(([start], start + np.cumsum(steps, axis = 0))))
+			line.PTline #Built here so neither method is timed building it
+			pair.append(line)
+		pairs.append(pair)
+	return pairs
+
+def extrapTimes(numPoints, numPairs = EXTRAP_PAIRS, repeat = 1):
+	#Returns the best times of calling extrapIntersec on every pair and of extrapIntersecMany on all of them
+	pairs = makeExtrapPairs(numPairs, numPoints, np.random.default_rng(0))
+	lineList = [pair[0] for pair in pairs]
+	otherList = [pair[1] for pair in pairs]
+	bounds = (T_RANGE[0], T_RANGE[1], P_RANGE[0], P_RANGE[1])
+	bestLoop = None
+	bestMany = None
+	for i in range(repeat):
+		start = time.perf_counter()
+		for j in range(numPairs):
+			lineList[j].extrapIntersec(otherList[j], *bounds)
+		loopSeconds = time.perf_counter() - start
+		start = time.perf_counter()
+		DomLine.extrapIntersecMany(lineList, otherList, *bounds)
+		manySeconds = time.perf_counter() - start
+		if bestLoop is None or loopSeconds < bestLoop:
+			bestLoop = loopSeconds
+		if bestMany is None or manySeconds < bestMany:
+			bestMany = manySeconds
+	return bestLoop, bestMany
+
+def importTime(moduleName, repeat = 1):
+	#Returns the best time over repeat fresh interpreters to import moduleName and whether it loaded matplotlib
+	best = None
+	for i in range(repeat):
+		result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT % moduleName], capture_output = True, text = True, check = True,
+			cwd = os.path.dirname(os.path.abspath(__file__)))
+		seconds, loadsMatplotlib = result.stdout.split()
+		if best is None or float(seconds) < best:
+			best = float(seconds)
+	return best, loadsMatplotlib == "True"
+
+def main(argv = None):
+	argParser = argparse.ArgumentParser(description = "Time the processing of synthetic domino stages of growing size")
+	argParser.add_argument("--scales", default = "1,2,4", help = "Comma separated size multipliers (default 1,2,4)")
+	argParser.add_argument("--repeat", type = int, default = 3, help = "Runs of each size, the best time is kept (default 3)")
+	argParser.add_argument("--engine", choices = POLY_ENGINES, default = POLY_ENGINES[0], help = "Method used to build the phase fields (default sort)")
+	argParser.add_argument("--renderer", choices = RENDERERS, default = RENDERERS[0], help = "How the lines and fields are drawn (default collections)")
+	argParser.add_argument("--extrap-points", default = EXTRAP_POINTS, help = "Comma separated line lengths to time extrapIntersecMany at, empty to skip (default " + EXTRAP_POINTS + ")")
+	argParser.add_argument("--output", default = BENCH_OUTPUT, help = "File the results are written to (default " + BENCH_OUTPUT + ")")
+	args = argParser.parse_args(argv)
+
+	useAgg()
+
+	lines = ["module import matplotlib"]
+	for moduleName in IMPORT_MODULES:
+		seconds, loadsMatplotlib = importTime(moduleName, args.repeat)
+		line = "%s %.4f %s" % (moduleName, seconds, "yes" if loadsMatplotlib else "no")
+		print(line)
+		lines.append(line)
+	lines.append("")
+
+	extrapPoints = [int(text) for text in args.extrap_points.split(",") if len(text.strip()) > 0]
+	if len(extrapPoints) > 0:
+		lines.append("points pairs extrapIntersec extrapIntersecMany")
+		for numPoints in extrapPoints:
+			loopSeconds, manySeconds = extrapTimes(numPoints, EXTRAP_PAIRS, args.repeat)
+			line = "%d %d %.4f %.4f" % (numPoints, EXTRAP_PAIRS, loopSeconds, manySeconds)
+			print(line)
+			lines.append(line)
+		lines.append("")
+
+	lines += ["scale isopleths points fragments grid phaseFragments " + " ".join(BENCH_PHASES)]
+	numWrong = 0
+	for scale in [int(text) for text in args.scales.split(",") if len(text.strip()) > 0]:
+		size = scaleSize(scale)
+		best, problems = runSize(size, args.repeat, args.engine, args.renderer)
+		line = "%d %d %d %d %d %d " % (scale, size["numIsopleths"], size["numPoints"], size["numFragments"], size["gridSize"], size["phaseFragments"])
+		line += " ".join("%.4f" % best[phaseName] for phaseName in BENCH_PHASES)
+		print(line)
+		lines.append(line)
+		#The times of a stage that was not put back together are not comparable, so say so next to them
+		for problem in problems:
+			print("  scale %d: %s" % (scale, problem))
+			lines.append("  scale %d: %s" % (scale, problem))
+		if len(problems) > 0:
+			numWrong += 1
+	with open(args.output, "w") as benchFile:
+		benchFile.write("\n".join(lines) + "\n")
+	if numWrong > 0:
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
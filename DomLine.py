@@ -3,31 +3,101 @@
 #name is not defined by default
 from shapely.geometry import Point, LineString, MultiLineString, MultiPoint
 from shapely.ops import linemerge, snap, nearest_points
-import copy
+import numpy as np
+import math
+import logging
 
 T_THRESH = 1.5
 P_THRESH = 30
 EXTRAP_RATIO = 50
 MAX_EXTRAP = 50
 EQ_THRESH= 0.0001
+SOLVE_EPS = 1e-9 #Relative tolerance for when extrapIntersecMany treats two segments as touching or parallel and leaves the pair to extrapIntersec
+EXTRAP_CHUNK = 100000 #Segment tests extrapIntersecMany does in one numpy pass
 import sys
+
+logger = logging.getLogger(__name__)
+
 class DomLine: 
 
-	def __init__(self, name = None):
+	def __init__(self, name = None, coords = None):
 
-		self.PTline = LineString() #Empty PT line where x = T and y = P
+		#Coordinates are held as a read only (N,2) array where x = T and y = P
+		#The shapely PTline is only built from them the first time it is asked for
+		#Neither is ever changed in place, new coordinates always replace them, so copies of a line can share them
+		if coords is None:
+			coords = np.empty((0,2))
+		self.setCoords(coords)
+		self.axIntersec = []
+		self.intersectedAx = []
+		self._axAtEnds = [] #(at first point, at last point) for each axis intersection
 		self.leftSide = name #if only one value to a line (e.g. isopleth) only the leftside will have a name
 		self.rightSide = None
 
-	def addPT(self, tIn, pIn):
+	@property
+	def PTline(self):
+		#Builds the geometry from the coordinate array on first use
+		#After this the shapely object is the authority on the coordinates
+		if self._PTline is None:
+			if len(self._coords) == 0:
+				self._PTline = LineString()
+			elif len(self._coords) == 1:
+				self._PTline = Point(self._coords[0])
+			else:
+				self._PTline = LineString(self._coords)
+			self._coords = None
+		return self._PTline
+
+	@PTline.setter
+	def PTline(self, geom):
+		self._PTline = geom
+		self._coords = None
+		self._axes = None
+
+	def getCoords(self):
+		#Returns the coordinates as an (N,2) array without building the geometry if it is not there yet
+		if self._PTline is None:
+			return self._coords
+		return np.asarray(self._PTline.coords).reshape(-1,2)
+
+	def setCoords(self, coords, keepAxes = False):
+		#Replaces all coordinates at once, the geometry is rebuilt lazily
+		#Any cached axis intersections are dropped unless keepAxes is True
+		self._coords = np.asarray(coords, dtype = float).reshape(-1,2)
+		self._coords.flags.writeable = False
+		self._PTline = None
+		if not keepAxes:
+			self._axes = None
+
+	def reverse(self):
+		#Flips the direction of the line
+		#The axis intersections dont move, so the cached ends are swapped instead of found again
+		self.setCoords(self.getCoords()[::-1], keepAxes = True)
+		if self._axes is not None:
+			self._axAtEnds = [(atLast, atFirst) for atFirst, atLast in self._axAtEnds]
+
+	@property
+	def axInterLoc(self):
+		#Index of the end of the line at each axis intersection, 0 for the first point and the last index otherwise
+		lastIndex = len(self.getCoords()) - 1
+		return [0 if atFirst else lastIndex for atFirst, atLast in self._axAtEnds]
 
-		pointList = list(self.PTline.coords)
-		pointList.append((tIn,pIn))
+	def addPT(self, tIn, pIn):
 
-		if(len(self.PTline.coords)<1):
-			self.PTline = Point(pointList)
-		else:
-			self.PTline = LineString(pointList)
+		self.setCoords(np.append(self.getCoords(), [(tIn,pIn)], axis = 0))
+
+	def copy(self):
+		#Returns a DomLine that can be reversed or extended without changing this one
+		#The coordinates and geometry are shared since they are never changed in place
+		newLine = DomLine(self.leftSide)
+		newLine.rightSide = self.rightSide
+		newLine._coords = self._coords
+		newLine._PTline = self._PTline
+		newLine._axes = self._axes
+		newLine.axIntersec = list(self.axIntersec)
+		newLine.intersectedAx = list(self.intersectedAx)
+		newLine._axAtEnds = list(self._axAtEnds)
+		return newLine
 
 	def addLeftSide(self, name):
 		self.leftSide = name
@@ -40,29 +110,25 @@ class DomLine:
 	#BAsed off of T_THRESH and P_THRESH
 	#Returns true if join is succesful
 
-		numPoints = len(self.PTline.coords)
-		thisPTline = copy.deepcopy(self.PTline)
+		thisCoords = self.getCoords()
 		#Check if the threshold is met for P and T then adds the values of toJoin to this domLine
 		for i in range(3):
-			joinX = toJoin.PTline.coords[0][0]
-			joinY = toJoin.PTline.coords[0][1]
-			lastX = thisPTline.coords[numPoints-1][0]
-			lastY = thisPTline.coords[numPoints-1][1]
+			joinX, joinY = toJoin.getCoords()[0]
+			lastX, lastY = thisCoords[-1]
 			
 			if abs(joinX - lastX) < T_THRESH and abs(joinY - lastY) < P_THRESH:
 
-				newCoords = list(thisPTline.coords)
-				newCoords.extend(list(toJoin.PTline.coords))
-				self.PTline.coords = newCoords
+				self.setCoords(np.concatenate((thisCoords, toJoin.getCoords())))
 
 
 				return True
 			if i == 0:
-				toJoin.PTline.coords = list(toJoin.PTline.coords)[::-1]
+				toJoin.reverse()
 			#First pass no match, invert the toJoin line
 			if i == 1:
 			#Second pass, still no match, invert the self PT line. This is to cover the case where the first cell in each line matches
-				thisPTline.coords = list(thisPTline.coords)[::-1]
+				#Only a reversed view, self is not changed unless the join works
+				thisCoords = thisCoords[::-1]
 
 
 
@@ -76,14 +142,15 @@ class DomLine:
 			loopNum = 2
 		else:
 			loopNum = 1
-			newCoords = list(copy.deepcopy(self.PTline.coords))
+			coords = self.getCoords()
+			newCoords = coords
 			for i in range(loopNum):
 				if atEnd:
-					p2 = self.PTline.coords[len(self.PTline.coords)-1]
-					p1 = self.PTline.coords[len(self.PTline.coords)-2]
+					p2 = tuple(coords[-1])
+					p1 = tuple(coords[-2])
 				else:
-					p2 = self.PTline.coords[0]
-					p1 = self.PTline.coords[1]
+					p2 = tuple(coords[0])
+					p1 = tuple(coords[1])
 				#Need something to check to make sure this is not extrapolating past the limits of the axes
 				if len(self.axIntersec) > 1:
 					break
@@ -94,13 +161,10 @@ class DomLine:
 				nextPtX = (p2[0]-p1[0])*extrapRat + p2[0]
 				nextPtY = (p2[1]-p1[1])*extrapRat + p2[1]
 
-				nextPt = Point(nextPtX, nextPtY)
-
-
 				if atEnd:
-					newCoords.extend(nextPt.coords)
+					newCoords = np.concatenate((newCoords, [(nextPtX, nextPtY)]))
 				else:
-					newCoords.insert(0,list(nextPt.coords)[0]) #I dont know why I have to do this but it breaks if just feeding it the coords
+					newCoords = np.concatenate(([(nextPtX, nextPtY)], newCoords))
 
 				atEnd = not atEnd
 
@@ -111,9 +175,12 @@ class DomLine:
 	def axesIntersect(self, axes):
 	#this checks intersections with axes and stores these 
 	#Maximum of two axes intersections
+	#The result is kept until the coordinates change, so calling this again with the same axes is free
+		if self._axes is axes:
+			return
 		self.axIntersec = []
 		self.intersectedAx = []
-		self.axInterLoc = []
+		self._axAtEnds = []
 		for line in axes:
 			intersect = self.PTline.intersection(line)
 
@@ -127,14 +194,10 @@ class DomLine:
 				
 				x2= self.PTline.coords[0][0]
 				y2 = self.PTline.coords[0][1]
-				#x3, y3 = self.PTline.xy[len(self.PTline.xy)-1]
-				
+				x3, y3 = self.PTline.coords[len(self.PTline.coords)-1]
 				
 				#Checking which end is the intersection
-				if abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH:
-					self.axInterLoc.append(0)
-				else:
-					self.axInterLoc.append(len(self.PTline.coords)-1)
+				self._axAtEnds.append((abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH, abs(x1-x3) <= EQ_THRESH and abs(y1-y3) <= EQ_THRESH))
 			
 			else:
 				#If there is an error in the data and the line does not quite intersect...
@@ -155,14 +218,13 @@ class DomLine:
 					# print("Closest Points: ")
 					# print(closestPoints[0].coords[0])
 					# print(closestPoints[1].coords[0])
-					if abs(x2-x3) <= EQ_THRESH and abs(y2-y3) <= EQ_THRESH:
+					atFirst = abs(x2-x3) <= EQ_THRESH and abs(y2-y3) <= EQ_THRESH
+					atLast = abs(x2-x4) <= EQ_THRESH and abs(y2-y4) <= EQ_THRESH
+					if atFirst or atLast:
 						self.axIntersec.append(closestPoints[0])
 						self.intersectedAx.append(line)
-						self.axInterLoc.append(0)
-					elif abs(x2-x4) <= EQ_THRESH and abs(y2-y4) <= EQ_THRESH:
-						self.axIntersec.append(closestPoints[0])
-						self.intersectedAx.append(line)
-						self.axInterLoc.append(len(self.PTline.coords)-1)
+						self._axAtEnds.append((atFirst, atLast))
+		self._axes = axes
 
 
 	def extrapIntersec(self, otherLine, tMin = 0, tMax = 10000, pMin = 0, pMax = 3000000, extrapolRat = EXTRAP_RATIO):
@@ -170,7 +232,7 @@ class DomLine:
 	#Will actually return itself PLUS the intersection coordinate added to the correct side of the line
 		smallestDistance = sys.float_info.max #Used as a flag in case of divergence
 		tryEnds = [True, True]
-		lineInter = list(copy.deepcopy(self.PTline.coords))
+		lineInter = self.getCoords()
 		# chkDiverge= False
 		parallelCount = 1
 		# if extrapolRat == MAX_EXTRAP:
@@ -188,7 +250,7 @@ class DomLine:
 				# 		thisExtrap = thisExtrap.parallel_offset(10, 'left', join_style = 2)
 				# 	else:
 				# 		thisExtrap = thisExtrap.parallel_offset(10, 'right', join_style = 2)
-				intersect = thisExtrap.intersection(LineString(otherLine.PTline))
+				intersect = thisExtrap.intersection(otherLine.PTline)
 
 				if isinstance(intersect, Point):
 					#Triggers if the thisLine extrapolation intersects otherLine without extrapolation
@@ -209,7 +271,7 @@ class DomLine:
 					# print(thisExtrap)
 					# print("OtherLine extrapolation:")
 					# print(otherExtrap)
-					intersect = self.PTline.intersection(LineString(otherExtrap))
+					intersect = self.PTline.intersection(otherExtrap)
 
 					if isinstance(intersect, Point):
 						#Triggers if the otherline extrapolation intersects thisLine without extrapolation
@@ -219,35 +281,19 @@ class DomLine:
 
 						distanceFirst = intersect.distance(firstPoint)
 						distanceLast = intersect.distance(lastPoint)
-						print("Intersection of unextrapolated line:")
-						print(distanceFirst)
-						print(distanceLast)
-						print("ThisLine extrapolation:")
-						print(thisExtrap)
-						print("OtherLine extrapolation:")
-						print(otherExtrap)
-						print("yay an intersection!")
-						print(intersect)
-						print(tryEnds[0])
-						print(tryEnds[1])
+						logger.debug("Intersection of unextrapolated line, %s from the first point and %s from the last", distanceFirst, distanceLast)
+						logger.debug("ThisLine extrapolation: %s, OtherLine extrapolation: %s, intersection: %s at ends %s %s", thisExtrap, otherExtrap, intersect, tryEnds[0], tryEnds[1])
 						if distanceFirst > distanceLast:
 							lineInter = lineInter[::-1]
 						return LineString(lineInter), 0
 
 
-					intersect = thisExtrap.intersection(LineString(otherExtrap))
+					intersect = thisExtrap.intersection(otherExtrap)
 
 					if isinstance(intersect, Point):
 						t = intersect.coords[0][0]
 						p = intersect.coords[0][1]
-						print("ThisLine extrapolation:")
-						print(thisExtrap)
-						print("OtherLine extrapolation:")
-						print(otherExtrap)
-						print("yay an intersection!")
-						print(intersect)
-						print(tryEnds[0])
-						print(tryEnds[1])
+						logger.debug("ThisLine extrapolation: %s, OtherLine extrapolation: %s, intersection: %s at ends %s %s", thisExtrap, otherExtrap, intersect, tryEnds[0], tryEnds[1])
 
 						if t< tMin or t >tMax or p <pMin or p>pMax:
 							return None, smallestDistance
@@ -256,18 +302,15 @@ class DomLine:
 						# 		lineInter = lineInter[::-1]
 						# 	return LineString(lineInter)
 						if tryEnds[0]:
-							lineInter.extend(intersect.coords)
+							lineInter = np.concatenate((lineInter, intersect.coords))
 						else:
-							lineInter = lineInter[::-1]
-							lineInter.extend(intersect.coords)
+							lineInter = np.concatenate((lineInter[::-1], intersect.coords))
 
 						return LineString(lineInter), 0
 					elif isinstance(intersect, MultiPoint) or isinstance(intersect, MultiLineString):
 					#If the extrapolations are roughly parallel, that means you dont need an extra intersection point
 					#Just add the line as normal
-						print("Multiple intersections ")
-						print("yay an intersection!")
-						print(intersect)
+						logger.debug("Multiple intersections: %s", intersect)
 						if not tryEnds[0]:
 							lineInter = lineInter[::-1]
 						return LineString(lineInter), 0
@@ -282,4 +325,193 @@ class DomLine:
 
 			tryEnds[0] = not tryEnds[0]
 
-		return None, smallestDistance
\ No newline at end of file
+		return None, smallestDistance
+
+
+def _lineSegments(line, extrapRat):
+	#Returns the segments of line as (starts, ends, kinds), kind 0 is the line itself,
+	#kind 1 the extrapolation past its last point and kind 2 the extrapolation past its first point
+	#Extrapolations are built the same way as in extrapLine, and left out when it would not extrapolate
+	#Zero length segments are dropped, they cant add an intersection or shorten a distance
+	coords = line.getCoords()
+	if len(line.axIntersec) <= 1:
+		starts = np.concatenate((coords[:-1], coords[-1:], coords[:1]))
+		ends = np.concatenate((coords[1:], (coords[-1:] - coords[-2:-1])*extrapRat + coords[-1:], (coords[:1] - coords[1:2])*extrapRat + coords[:1]))
+		kinds = np.zeros(len(starts), dtype = int)
+		kinds[-2:] = (1, 2)
+	else:
+		starts = coords[:-1]
+		ends = coords[1:]
+		kinds = np.zeros(len(starts), dtype = int)
+	keep = np.any(starts != ends, axis = 1)
+	return starts[keep], ends[keep], kinds[keep]
+
+def _pointSegDist(pt, segStart, segEnd):
+	#Distance from each pt to each segment, the same formula GEOS uses
+	segVec = segEnd - segStart
+	len2 = segVec[:,0]*segVec[:,0] + segVec[:,1]*segVec[:,1]
+	toPt = pt - segStart
+	along = (toPt[:,0]*segVec[:,0] + toPt[:,1]*segVec[:,1])/len2
+	side = np.abs((segStart[:,1] - pt[:,1])*segVec[:,0] - (segStart[:,0] - pt[:,0])*segVec[:,1])/len2
+	toEnd = pt - segEnd
+	return np.where(along <= 0, np.sqrt(toPt[:,0]*toPt[:,0] + toPt[:,1]*toPt[:,1]),
+		np.where(along >= 1, np.sqrt(toEnd[:,0]*toEnd[:,0] + toEnd[:,1]*toEnd[:,1]), side*np.sqrt(len2)))
+
+def _segHits(aStart, aEnd, bStart, bEnd):
+	#Intersects segment a with segment b on every row
+	#Returns (crossing, hitPts, segDist, unsure), unsure is True where the two only just touch or are parallel and touching
+	r = aEnd - aStart
+	s = bEnd - bStart
+	qp = bStart - aStart
+	denom = r[:,0]*s[:,1] - r[:,1]*s[:,0]
+	lenR = np.sqrt(r[:,0]*r[:,0] + r[:,1]*r[:,1])
+	lenS = np.sqrt(s[:,0]*s[:,0] + s[:,1]*s[:,1])
+	parallel = np.abs(denom) <= SOLVE_EPS*lenR*lenS
+	safeDenom = np.where(parallel, 1, denom)
+	t = (qp[:,0]*s[:,1] - qp[:,1]*s[:,0])/safeDenom
+	u = (qp[:,0]*r[:,1] - qp[:,1]*r[:,0])/safeDenom
+
+	#Segments that share an end point exactly meet at exactly that point
+	sharedPt = np.full(aStart.shape, np.nan)
+	for aPt in (aStart, aEnd):
+		for bPt in (bStart, bEnd):
+			same = np.all(aPt == bPt, axis = 1)
+			sharedPt[same] = aPt[same]
+	shared = ~np.isnan(sharedPt[:,0])
+
+	inRange = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+	nearRange = ~parallel & (t > -SOLVE_EPS) & (t < 1 + SOLVE_EPS) & (u > -SOLVE_EPS) & (u < 1 + SOLVE_EPS)
+	nearEnd = (np.minimum(np.abs(t), np.abs(1 - t)) < SOLVE_EPS) | (np.minimum(np.abs(u), np.abs(1 - u)) < SOLVE_EPS)
+
+	segDist = np.minimum(np.minimum(_pointSegDist(aStart, bStart, bEnd), _pointSegDist(aEnd, bStart, bEnd)),
+		np.minimum(_pointSegDist(bStart, aStart, aEnd), _pointSegDist(bEnd, aStart, aEnd)))
+	crossing = inRange | shared
+	segDist[crossing] = 0
+	unsure = (nearRange & nearEnd & ~shared) | (parallel & (segDist <= SOLVE_EPS*(lenR + lenS)))
+	hitPts = np.where(shared[:,None], sharedPt, aStart + t[:,None]*r)
+	return crossing, hitPts, segDist, unsure
+
+def _pointSet(geom):
+	#The (T, P) of every point of an intersection, None if it is not only points
+	if geom.is_empty:
+		return set()
+	if isinstance(geom, Point):
+		return {geom.coords[0]}
+	if isinstance(geom, MultiPoint):
+		return {pt.coords[0] for pt in geom.geoms}
+	return None
+
+def extrapIntersecMany(lineList, otherList, tMin = 0, tMax = 10000, pMin = 0, pMax = 3000000, extrapolRat = EXTRAP_RATIO):
+	#Same as [lineList[i].extrapIntersec(otherList[i], ...) for every i] without building any extrapolated LineStrings
+	#The two lines of a pair are intersected once with shapely, only the extrapolations (one segment past each end) go through numpy:
+	#each extrapolation is tested against every segment and extrapolation of the partner, so the work grows with the length of the lines and not their product
+	#The four end combinations of extrapIntersec are then worked out from which pieces (line or extrapolation) the intersections came from
+	#Pairs are solved in chunks of about EXTRAP_CHUNK segment tests so the arrays stay small however many pairs there are
+	#Pairs where the lines overlap, or two segments only just touch or are parallel and touching, are sent to extrapIntersec itself
+	#so the odd cases are decided by shapely exactly as before
+	numPairs = len(lineList)
+	results = [None]*numPairs
+	chunk = []
+	chunkRows = 0
+	for i in range(numPairs):
+		thisLine = lineList[i]
+		otherLine = otherList[i]
+		thisSegs = _lineSegments(thisLine, extrapolRat)
+		otherSegs = _lineSegments(otherLine, extrapolRat)
+		linePts = None
+		if np.any(thisSegs[2] == 0) and np.any(otherSegs[2] == 0):
+			linePts = _pointSet(thisLine.PTline.intersection(otherLine.PTline))
+		if linePts is None:
+			results[i] = thisLine.extrapIntersec(otherLine, tMin, tMax, pMin, pMax, extrapolRat)
+			continue
+		chunk.append((i, linePts, thisSegs, otherSegs))
+		chunkRows += np.count_nonzero(thisSegs[2])*len(otherSegs[2]) + np.count_nonzero(otherSegs[2])*np.count_nonzero(thisSegs[2] == 0)
+		if chunkRows >= EXTRAP_CHUNK:
+			_solveChunk(lineList, otherList, chunk, results, tMin, tMax, pMin, pMax, extrapolRat)
+			chunk = []
+			chunkRows = 0
+	if len(chunk) > 0:
+		_solveChunk(lineList, otherList, chunk, results, tMin, tMax, pMin, pMax, extrapolRat)
+	return results
+
+def _solveChunk(lineList, otherList, chunk, results, tMin, tMax, pMin, pMax, extrapolRat):
+	#Tests the extrapolations of every pair in chunk against its partner in one numpy pass and fills in their results
+	#Rows are the extrapolations of this line against all of otherLine, then this line itself against the extrapolations of otherLine
+	pairIds, aStart, aEnd, aKind, bStart, bEnd, bKind = [], [], [], [], [], [], []
+	for pairId in range(len(chunk)):
+		i, linePts, (thisStart, thisEnd, thisKind), (otherStart, otherEnd, otherKind) = chunk[pairId]
+		for thisRows, otherRows in ((thisKind != 0, otherKind >= 0), (thisKind == 0, otherKind != 0)):
+			thisIndex = np.nonzero(thisRows)[0]
+			otherIndex = np.nonzero(otherRows)[0]
+			thisIndex, otherIndex = np.repeat(thisIndex, len(otherIndex)), np.tile(otherIndex, len(thisIndex))
+			pairIds.append(np.full(len(thisIndex), pairId))
+			aStart.append(thisStart[thisIndex])
+			aEnd.append(thisEnd[thisIndex])
+			aKind.append(thisKind[thisIndex])
+			bStart.append(otherStart[otherIndex])
+			bEnd.append(otherEnd[otherIndex])
+			bKind.append(otherKind[otherIndex])
+	pairIds = np.concatenate(pairIds)
+	aKind = np.concatenate(aKind)
+	bKind = np.concatenate(bKind)
+	crossing, hitPts, segDist, unsure = _segHits(np.concatenate(aStart).reshape(-1, 2), np.concatenate(aEnd).reshape(-1, 2),
+		np.concatenate(bStart).reshape(-1, 2), np.concatenate(bEnd).reshape(-1, 2))
+
+	#Smallest distance and the intersection points between each piece of the two lines, (0,0) is left to _solvePair
+	pieceDist = np.full((len(chunk), 3, 3), np.inf)
+	np.minimum.at(pieceDist, (pairIds, aKind, bKind), segDist)
+	piecePts = {}
+	for j in np.nonzero(crossing)[0]:
+		piecePts.setdefault((pairIds[j], aKind[j], bKind[j]), set()).add((hitPts[j][0], hitPts[j][1]))
+	fallBack = set(pairIds[unsure].tolist())
+
+	for pairId in range(len(chunk)):
+		i, linePts = chunk[pairId][:2]
+		if pairId in fallBack:
+			results[i] = lineList[i].extrapIntersec(otherList[i], tMin, tMax, pMin, pMax, extrapolRat)
+		else:
+			results[i] = _solvePair(lineList[i], otherList[i], linePts, pairId, piecePts, pieceDist, tMin, tMax, pMin, pMax)
+
+def _solvePair(thisLine, otherLine, linePts, pairId, piecePts, pieceDist, tMin, tMax, pMin, pMax):
+	#Goes through the end combinations in the same order as extrapIntersec
+	#piece 0 is a line itself, 1 its extrapolation past the last point and 2 past the first point
+	#linePts are the intersections of the two lines themselves
+	def points(*pieces):
+		pts = set(linePts)
+		for thisPiece, otherPiece in pieces:
+			pts |= piecePts.get((pairId, thisPiece, otherPiece), set())
+		return pts
+
+	coords = thisLine.getCoords()
+	smallestDistance = sys.float_info.max
+	lineDistance = None
+	for thisEnd in (True, False):
+		thisPiece = 1 if thisEnd else 2
+		intersect = points((thisPiece,0))
+		if len(intersect) == 1:
+			#The extrapolation of this line intersects otherLine without extrapolation
+			return LineString(coords if thisEnd else coords[::-1]), 0
+		for otherEnd in (True, False):
+			otherPiece = 1 if otherEnd else 2
+			intersect = points((0,otherPiece))
+			if len(intersect) == 1:
+				#The otherLine extrapolation intersects this line without extrapolation
+				t, p = intersect.pop()
+				distanceFirst = math.sqrt((t - coords[0][0])**2 + (p - coords[0][1])**2)
+				distanceLast = math.sqrt((t - coords[-1][0])**2 + (p - coords[-1][1])**2)
+				return LineString(coords[::-1] if distanceFirst > distanceLast else coords), 0
+
+			intersect = points((thisPiece,0), (0,otherPiece), (thisPiece,otherPiece))
+			if len(intersect) == 1:
+				t, p = intersect.pop()
+				if t< tMin or t >tMax or p <pMin or p>pMax:
+					return None, smallestDistance
+				return LineString(np.concatenate((coords if thisEnd else coords[::-1], [(t, p)]))), 0
+			elif len(intersect) > 1:
+				#Roughly parallel extrapolations, the line is used as it is
+				return LineString(coords if thisEnd else coords[::-1]), 0
+			#Nothing intersects, so the lines themselves dont either and their distance is only needed here
+			if lineDistance is None:
+				lineDistance = thisLine.PTline.distance(otherLine.PTline)
+			smallestDistance = min(smallestDistance, lineDistance, pieceDist[pairId,thisPiece,0], pieceDist[pairId,0,otherPiece], pieceDist[pairId,thisPiece,otherPiece])
+	return None, smallestDistance
@@ -1,105 +1,78 @@
 #Class for handling a Domino Polygon
-from shapely.geometry import Point, LineString, MultiLineString, Polygon, MultiPolygon
-from shapely.ops import linemerge, snap
-import matplotlib.pyplot as plt
-import copy
+from shapely.geometry import Polygon, MultiPolygon
+import logging
 
 PHASES = ["Fluid","Fsp","Grt","Ilm","Bt","Chl","WM","Qz","Gr","And","Ky","Sil","St","Crd","Czo","Mrg","Cld","Rt","Melt"]
 FILL_OPTIONS = ["barrovian"]
+
+BARROVIAN_COLOURS = [("Melt", "gold", "black"), ("Crd", "magenta", "black"), ("Sil", "blueviolet", "white"), ("Ky", "cyan", "black"),
+	("St", "yellow", "black"), ("Grt", "red", "black"), ("Bt", "sandybrown", "black"), ("Chl", "green", "white")] #(phase, fill, text colour), the first phase found in a field wins
+DEFAULT_COLOURS = ("white", "blue") #Fill and text colour of a barrovian field that has none of the phases above
+
+logger = logging.getLogger(__name__)
+
+def fieldColours(phases, fillOp = None):
+	#Returns the (fill colour, text colour) of a field with the phase string phases
+	#The fill colour is None if the fields are not filled
+	if fillOp != FILL_OPTIONS[0]:
+		return None, DEFAULT_COLOURS[1]
+	for phase, fillColour, textColour in BARROVIAN_COLOURS:
+		if phase in phases:
+			return fillColour, textColour
+	return DEFAULT_COLOURS
+
 class DomPoly:
 
 	def __init__(self, polyCoords,name):
 		#Coordinates will be defined outside of this class constructor
-		self.field = Polygon(polyCoords)
+		#polyCoords can also be a ready made Polygon
+		if isinstance(polyCoords, Polygon):
+			self.field = polyCoords
+		else:
+			self.field = Polygon(polyCoords)
 		self.phases = name
 		self.renamePhases()
-		if not self.field.is_valid:
-			newField = self.field.buffer(0)
-			# print(newField)
-			# if newField.is_valid:
-			# 	self.field = newField
-			# 	print(self.phases + " is a valid Poly")
-			# else:
-			print(self.phases + " not a valid Poly")
-		else:
-			print(self.phases + " is a valid Poly")
-		print("\n")
+		#Checking the polygon is only worth the time if the result is going to be seen
+		if logger.isEnabledFor(logging.DEBUG):
+			if not self.field.is_valid:
+				logger.debug("%s not a valid Poly", self.phases)
+			else:
+				logger.debug("%s is a valid Poly", self.phases)
 
 
 	def plotPoly(self, pltIn, index, csvWriter, areaMin = 0, fillOp = None):
+		#Draws this field on pltIn, numbered index + 1 if it is at least areaMin
+		#csvWriter is a PhaseCsv.PhaseCsvWriter that gets a row for every numbered part, or None
 		
 		index = index+1
-		delimit = ","
-		print("Plotting: " + self.phases)
-		print(self.field)
-		print(self.field.is_valid)
-		print(self.field.is_empty)
-		if not self.field.is_empty:
-			if isinstance(self.field, MultiPolygon):
-				fields = list(self.field)
-			elif isinstance(self.field, Polygon):
-				fields = [self.field]
-			for poly in fields:
-				x, y = poly.exterior.xy
-				
-				textX, textY = poly.representative_point().xy
-				
-				textX = float(textX[0])
-				textY = float(textY[0])
-				
-				textColour = "blue"
-
-				if fillOp == FILL_OPTIONS[0]: #Fill the fields according to the barrovian zones
-					fillColour = "white"
-					if "Melt" in self.phases:
-						fillColour = "gold"
-						textColour = "black"
-					elif "Crd" in self.phases:
-						fillColour = "magenta"
-						textColour = "black"
-					elif "Sil" in self.phases:
-						fillColour = "blueviolet"
-						textColour = "white"
-					elif "Ky" in self.phases:
-						fillColour = "cyan"
-						textColour = "black"
-					elif "St" in self.phases:
-						fillColour = "yellow"
-						textColour = "black"
-					elif "Grt" in self.phases:
-						fillColour = "red"
-						textColour = "black"
-					elif "Bt" in self.phases:
-						fillColour = "sandybrown"
-						textColour = "black"
-					elif "Chl" in self.phases:
-						fillColour = "green"
-						textColour = "white"
-					pltIn.fill(x,y,color=fillColour)
-
-				isValid = "No"
-				if poly.is_valid:	
-					isValid = "Yes"
-
-				pltIn.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
-				
-				if poly.area >= areaMin:
-					pltIn.text(textX, textY, str(index), fontsize = 10, color = textColour,horizontalalignment='center', verticalalignment='center')
+		if logger.isEnabledFor(logging.DEBUG):
+			logger.debug("Plotting: %s %s valid %s, empty %s", self.phases, self.field, self.field.is_valid, self.field.is_empty)
+		fillColour, textColour = fieldColours(self.phases, fillOp)
+		for poly in self.getParts():
+			x, y = poly.exterior.xy
+			
+			textX, textY = poly.representative_point().xy
+			
+			textX = float(textX[0])
+			textY = float(textY[0])
+			
+			if fillColour is not None:
+				pltIn.fill(x,y,color=fillColour)
 
-					
-					fieldString = str(self.field).replace("POLYGON ((","")
-					fieldString = fieldString.replace("))","")
-					# csvWriter.write(str(index) + delimit  + self.phases + delimit +  isValid + delimit + fieldString + "\n")
-					csvWriter.write(str(index) + delimit + self.phases + delimit)
-					for phase in PHASES:
-						if "(2)" + phase in self.phases:
-							csvWriter.write("(2)" + phase + delimit)
-						elif phase in self.phases:
-							csvWriter.write(phase + delimit)
-						else:
-							csvWriter.write(delimit)
-					csvWriter.write(isValid + delimit + fieldString + "\n")
+			pltIn.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
+			
+			if poly.area >= areaMin:
+				pltIn.text(textX, textY, str(index), fontsize = 10, color = textColour,horizontalalignment='center', verticalalignment='center')
+				if csvWriter is not None:
+					csvWriter.addField(index, self, poly)
 
+	def getParts(self):
+		#Returns the polygons that make up this field, more than one if it is a MultiPolygon and none if it is empty
+		if self.field.is_empty:
+			return []
+		if isinstance(self.field, MultiPolygon):
+			return list(self.field)
+		return [self.field]
 
 	def renamePhases(self):
 		#This is a long method to rename names of phases in the string
@@ -0,0 +1,116 @@
+#Functions for finding the plt files of a G_FRAC run
+#A directory is listed once and every file is sorted into sample, stage and member (alm, gr, py, spss or Phase)
+#The index is kept for the life of the process so every PlotStage shares one scan
+#and can also be written to a small manifest so the next run does not have to list the directory again
+#The names of the figures and csv made for a stage are also defined here
+
+import hashlib
+import json
+import os
+import re
+
+PLT_MATCH = re.compile(r"([^_]+?)_Stage(\d+)_([A-Za-z]+)\.plt$") #Sample name, stage number and member of a plt file
+MANIFEST_VERSION = 2 #Version 1 stored paths joined with the directory as it was given, which broke from another working directory
+
+_dirIndexes = {} #Absolute directory path to (directory mtime, index)
+
+def scanDir(fileDir):
+	#Lists fileDir once and returns {sampleName: {stageNum: {member: file name}}}
+	#Only the file names are kept so the index does not depend on how fileDir was written, see getStageFiles
+	index = {}
+	for filename in sorted(os.listdir(fileDir)):
+		fileMatch = PLT_MATCH.match(filename)
+		if fileMatch:
+			sampleName, stageNum, member = fileMatch.groups()
+			index.setdefault(sampleName, {}).setdefault(int(stageNum), {})[member] = filename
+	return index
+
+def manifestPath(fileDir, manifestDir):
+	#Manifests are kept outside the data directory since writing there would change its mtime
+	dirHash = hashlib.sha1(os.path.abspath(fileDir).encode("utf-8")).hexdigest()
+	return os.path.join(manifestDir, dirHash + "_index.json")
+
+def _readManifest(fileDir, manifestDir, dirMtime):
+	try:
+		with open(manifestPath(fileDir, manifestDir), "r") as manifestFile:
+			manifest = json.load(manifestFile)
+	except (OSError, ValueError):
+		return None
+	if manifest.get("version") != MANIFEST_VERSION or manifest.get("mtime") != dirMtime:
+		return None
+	#json keys are always strings so the stage numbers have to be turned back into ints
+	index = {}
+	for sampleName, stages in manifest["index"].items():
+		index[sampleName] = {int(stageNum): members for stageNum, members in stages.items()}
+	return index
+
+def _writeManifest(fileDir, manifestDir, dirMtime, index):
+	try:
+		os.makedirs(manifestDir, exist_ok = True)
+		thisPath = manifestPath(fileDir, manifestDir)
+		with open(thisPath + ".tmp", "w") as manifestFile:
+			json.dump({"version": MANIFEST_VERSION, "mtime": dirMtime, "index": index}, manifestFile)
+		os.replace(thisPath + ".tmp", thisPath)
+	except OSError:
+		#The manifest only saves time, not being able to write it is not a problem
+		pass
+
+def getIndex(fileDir, manifestDir = None):
+	#Returns the index of fileDir, only listing the directory if its contents changed since the last scan
+	#If manifestDir is given the index is also read from and saved to a manifest there
+	dirKey = os.path.abspath(fileDir)
+	dirMtime = os.stat(fileDir).st_mtime_ns
+	if dirKey in _dirIndexes and _dirIndexes[dirKey][0] == dirMtime:
+		return _dirIndexes[dirKey][1]
+
+	index = None
+	if manifestDir is not None:
+		index = _readManifest(fileDir, manifestDir, dirMtime)
+	if index is None:
+		index = scanDir(fileDir)
+		if manifestDir is not None:
+			_writeManifest(fileDir, manifestDir, dirMtime, index)
+	_dirIndexes[dirKey] = (dirMtime, index)
+	return index
+
+def getStageFiles(fileDir, stageNum, sampleName = None, manifestDir = None):
+	#Returns (sampleName, {member: path}) for one stage
+	#If sampleName is None the first sample (alphabetically) with that stage is used
+	#Returns (None, {}) if there is no such stage
+	index = getIndex(fileDir, manifestDir)
+	for thisSample in sorted(index):
+		if sampleName is not None and thisSample != sampleName:
+			continue
+		if stageNum in index[thisSample]:
+			members = index[thisSample][stageNum]
+			return thisSample, {member: os.path.join(fileDir, members[member]) for member in members}
+	return None, {}
+
+def isoFigName(sampleName, stageNum, figFormat):
+	return sampleName + "_Stage" + str(stageNum) + "." + figFormat
+
+def phaseFigName(sampleName, stageNum, figFormat):
+	return sampleName + "_Stage" + str(stageNum) + "_Phase." + figFormat
+
+def phaseListName(sampleName, stageNum):
+	return sampleName + "_Stage" + str(stageNum) + "_PhaseList.csv"
+
+def findUnits(rootDir, recursive = False, manifestDir = None):
+	#Returns a sorted list of (fileDir, sampleName, stageNum) for every sample and stage in rootDir
+	#If recursive is True every directory under rootDir is searched as well
+	if recursive:
+		fileDirs = []
+		for dirPath, dirNames, fileNames in os.walk(rootDir):
+			dirNames.sort()
+			if any(PLT_MATCH.match(filename) for filename in fileNames):
+				fileDirs.append(dirPath)
+	else:
+		fileDirs = [rootDir]
+
+	units = []
+	for fileDir in fileDirs:
+		index = getIndex(fileDir, manifestDir)
+		for sampleName in sorted(index):
+			for stageNum in sorted(index[sampleName]):
+				units.append((fileDir, sampleName, stageNum))
+	return units
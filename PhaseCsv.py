@@ -0,0 +1,90 @@
+#Writes the PhaseList csv of a stage, one row for each numbered part of each field
+#A row is the field number, the phase string, a column for each of PHASES, whether the polygon is valid and its coordinates
+#The coordinates are one quoted column of "T P" pairs in the same text shapely uses for WKT, holes follow the outside after "), ("
+#Rows are built from the coordinate arrays of the polygons and written in batches with the csv module
+#Nothing here draws, so the csv can be made without a figure (see writePhaseList)
+
+import csv
+import numpy as np
+
+from DomPoly import PHASES
+
+HEADER = ["Field", "PhaseString"] + PHASES + ["Valid Polygon", "Coordinates"]
+BATCH_ROWS = 256 #Rows kept before they are handed to the csv writer
+
+def formatNum(value):
+	#Shortest text that reads back as the same float, without an exponent or a trailing ".0" like WKT
+	return np.format_float_positional(value, trim = "-")
+
+def ringText(coords):
+	return ", ".join(formatNum(x) + " " + formatNum(y) for x, y in np.asarray(coords).tolist())
+
+def polyText(poly):
+	#The coordinates of a Polygon, the outside first and then every hole
+	rings = [ringText(poly.exterior.coords)]
+	for interior in poly.interiors:
+		rings.append(ringText(interior.coords))
+	return "), (".join(rings)
+
+def phaseColumns(phases):
+	#One column for each of PHASES, the phase name if it is in the phase string (with the "(2)" if there are two of it) and empty if not
+	columns = []
+	for phase in PHASES:
+		if "(2)" + phase in phases:
+			columns.append("(2)" + phase)
+		elif phase in phases:
+			columns.append(phase)
+		else:
+			columns.append("")
+	return columns
+
+def fieldRow(index, phases, poly):
+	isValid = "No"
+	if poly.is_valid:
+		isValid = "Yes"
+	return [str(index), phases] + phaseColumns(phases) + [isValid, polyText(poly)]
+
+class PhaseCsvWriter:
+
+	def __init__(self, fileName, batchRows = BATCH_ROWS):
+		#Opens fileName and writes the header, use in a with block or call close when done
+		self.fileName = fileName
+		self.batchRows = batchRows
+		self.rows = []
+		self.numRows = 0
+		self.csvFile = open(fileName, "w", newline = "")
+		self.writer = csv.writer(self.csvFile, lineterminator = "\n")
+		self.writer.writerow(HEADER)
+
+	def addField(self, index, domPoly, poly):
+		#Adds the row of poly, one part of the field of domPoly, numbered index
+		self.rows.append(fieldRow(index, domPoly.phases, poly))
+		self.numRows += 1
+		if len(self.rows) >= self.batchRows:
+			self.flush()
+
+	def flush(self):
+		self.writer.writerows(self.rows)
+		self.rows = []
+
+	def close(self):
+		self.flush()
+		self.csvFile.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		self.close()
+
+def writePhaseList(fileName, polyList, areaMin = 0):
+	#Writes the csv for a list of DomPolys numbered from 1 without drawing them
+	#Parts smaller than areaMin are left out like the unnumbered fields of the figure
+	#Returns the number of rows written
+	with PhaseCsvWriter(fileName) as csvWriter:
+		for count in range(len(polyList)):
+			domPoly = polyList[count]
+			for poly in domPoly.getParts():
+				if poly.area >= areaMin:
+					csvWriter.addField(count + 1, domPoly, poly)
+	return csvWriter.numRows
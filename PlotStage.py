@@ -1,86 +1,148 @@
 #This program is a class that will be used to plot one stage
 #of the G_FRAC run. Also will allow you to get a polygon intersection
+#matplotlib is only imported once a figure is needed, so the svg renderer runs without it
+#Figures are released as soon as they are saved so memory stays flat over a long batch run
 
-from PltParser import PltParser
-from DomLine import DomLine
-from DomPoly import DomPoly, PHASES
-import matplotlib.pyplot as plt
-from shapely.geometry import Point, LineString, MultiLineString, Polygon
-from shapely.ops import polygonize, polygonize_full
+from PltParser import PltParser, POLY_ENGINES
+from DomPoly import FILL_OPTIONS, fieldColours
+import numpy as np
 
-from labellines import labelLine, labelLines
+import FileIndex
+import PhaseCsv
+import Profiler
+import SvgWriter
 import os
-import re
+import sys
 
 
 GRT_CODES = ["alm","gr","py","spss"]
 COLOURS = ["red","orange","blue","green"]
 GRT_LABELS = ["Almandine", "Grossular","Pyrope","Spessartine"]
+PHASE_CODE = "Phase" #Member name of the phase diagram plt file
 MID_LINE = 2 #The position of the middle line with base 0
+FIG_FORMATS = ["svg"] #File extensions the figures are saved as by default
+FIG_SIZE = (12,10)
+AREA_MIN = 2000 #Fields smaller than this are drawn but not numbered or listed in the csv
+#collections draws every line style and the fields in a few batched artists, artists draws one per line and field
+#svg writes svg files with SvgWriter without matplotlib and uses collections for any other format
+RENDERERS = ["collections", "artists", "svg"]
+MAX_SPARE_FIGURES = 2 #A stage uses two figures, so at most two are kept for reuse
+
+_spareFigures = [] #(figure, axes) released by earlier stages in this process, see releaseFigure
+
+def useAgg():
+	#Makes matplotlib save files with the non-interactive backend
+	#If matplotlib has not been loaded yet only MPLBACKEND is set, so a run that never makes a figure never loads it
+	if sys.modules.get("matplotlib") is not None:
+		import matplotlib
+		matplotlib.use("Agg")
+	else:
+		os.environ["MPLBACKEND"] = "Agg"
+
+def lineCollection(segments, colour, lineStyle, lineWidth = 2):
+	#A LineCollection that draws like the same lines drawn one at a time with plot
+	#Line2D caps solid lines with "projecting" and dashed ones with "butt", a collection uses one style for both
+	from matplotlib.collections import LineCollection
+	capStyle = "projecting"
+	if lineStyle != "-":
+		capStyle = "butt"
+	return LineCollection(segments, colors = colour, linestyles = lineStyle, linewidths = lineWidth, capstyle = capStyle, joinstyle = "round", zorder = 2)
+
+def isDirectSvg(figFormat, renderer):
+	#True if a figure in figFormat is written by SvgWriter instead of matplotlib
+	return renderer == RENDERERS[2] and figFormat == "svg"
 
 class PlotStage():
 
-	def __init__(self, stageNum, fileDir):
+	def __init__(self, stageNum, fileDir, cacheDir = None, sampleName = None, reuseFigures = True):
+		#cacheDir is passed on to PltParser so parsed files can be reused between runs
+		#and is also where the manifest of the directory index is kept
+		#sampleName picks the sample when a directory holds more than one, by default the first one is used
+		#The figures are only made when something is drawn on them, see makeFigure
+		#If reuseFigures is True a figure is cleared and kept for the next stage once it is saved instead of being made again
 
 		self.fileDir = fileDir
+		self.reuseFigures = reuseFigures
 		self.stage = stageNum
 		self.pltList = []
 		self.sampleName = None
-		for i in range(len(GRT_CODES)):
-			suffix = "_Stage{:02d}".format(stageNum) + "_" + GRT_CODES[i] + ".plt"
-			pSuff = "_Stage{:02d}".format(stageNum) + "_Phase.plt"
-
-			for filename in os.listdir(fileDir):
-				fileMatch = re.compile("[^_]+?" + suffix)
-				pFileMatch = re.compile("[^_]+?" + pSuff)	
-
-				if fileMatch.match(filename):
-					self.sampleName = re.split("_", filename)[0]
-					#print(filename)
-					self.pltList.append(PltParser(os.path.join(fileDir,filename)))
-				elif pFileMatch.match(filename):
-					self.phasePlt = PltParser(os.path.join(fileDir,filename), isPhase = True)
-
-		#Set up the isopleth intersections based on the first Plt (alm)
-		if self.sampleName == None:
-			return
-
-		self.isoFig = plt.figure(figsize =(12,10))	
-		figname = self.sampleName + " Stage " + str(stageNum)
-
-		self.isoFig.suptitle(figname, fontsize = 16)
-
-		self.isoAx = self.isoFig.add_subplot()
-		self.isoAx.set_xlabel(self.pltList[0].xAx, fontsize = 14)
-		self.isoAx.set_ylabel(self.pltList[0].yAx, fontsize =14)
-		
-		self.isoAx.set_xlim(self.pltList[0].Tmin, self.pltList[0].Tmax)
-		self.isoAx.set_ylim(self.pltList[0].Pmin, self.pltList[0].Pmax)
-
-		self.phaseFig = plt.figure(figsize =(12,10))	
-		figname = self.sampleName + " Stage " + str(stageNum)
+		self.isoFig = None
+		self.phaseFig = None
+		#The directory is only listed once per process, see FileIndex
+		sampleName, stageFiles = FileIndex.getStageFiles(fileDir, stageNum, sampleName, manifestDir = cacheDir)
+		for code in GRT_CODES:
+			if code in stageFiles:
+				self.sampleName = sampleName
+				self.pltList.append(PltParser(stageFiles[code], cacheDir = cacheDir))
+		if PHASE_CODE in stageFiles:
+			self.phasePlt = PltParser(stageFiles[PHASE_CODE], isPhase = True, cacheDir = cacheDir)
+
+	def getTitle(self):
+		return self.sampleName + " Stage " + str(self.stage)
+
+	def makeFigure(self):
+		#Makes an empty figure with the title, axis labels and limits of this stage
+		#The axes are set up from the first Plt (alm)
+		#The figure is not registered with pyplot so nothing holds on to it once it is released
+		#Returns (figure, axes)
+		with Profiler.timePhase("figureSetup"):
+			if self.reuseFigures and len(_spareFigures) > 0:
+				thisFig, thisAx = _spareFigures.pop()
+				thisAx.clear()
+			else:
+				from matplotlib.figure import Figure
+				thisFig = Figure(figsize = FIG_SIZE)
+				thisAx = thisFig.add_subplot()
+			thisFig.suptitle(self.getTitle(), fontsize = 16)
+
+			thisAx.set_xlabel(self.pltList[0].xAx, fontsize = 14)
+			thisAx.set_ylabel(self.pltList[0].yAx, fontsize =14)
+			
+			thisAx.set_xlim(self.pltList[0].Tmin, self.pltList[0].Tmax)
+			thisAx.set_ylim(self.pltList[0].Pmin, self.pltList[0].Pmax)
+		return thisFig, thisAx
 
-		self.phaseFig.suptitle(figname, fontsize = 16)
+	def releaseFigure(self, thisFig, thisAx):
+		#Called once a figure is saved, it is kept for the next stage if reuseFigures is True
+		#and otherwise left for the garbage collector
+		if self.reuseFigures and len(_spareFigures) < MAX_SPARE_FIGURES:
+			_spareFigures.append((thisFig, thisAx))
 
-		self.phaseAx = self.phaseFig.add_subplot()
-		self.phaseAx.set_xlabel(self.pltList[0].xAx, fontsize = 14)
-		self.phaseAx.set_ylabel(self.pltList[0].yAx, fontsize =14)
-		
-		self.phaseAx.set_xlim(self.pltList[0].Tmin, self.pltList[0].Tmax)
-		self.phaseAx.set_ylim(self.pltList[0].Pmin, self.pltList[0].Pmax)
+	def makeSvg(self):
+		#The SvgWriter version of makeFigure
+		return SvgWriter.SvgPlot(self.getTitle(), self.pltList[0].xAx, self.pltList[0].yAx, (self.pltList[0].Tmin, self.pltList[0].Tmax), (self.pltList[0].Pmin, self.pltList[0].Pmax), FIG_SIZE)
 
 			
-	def plotIsos(self, saveDir, numError = 0):
+	def plotIsos(self, saveDir, numError = 0, formats = FIG_FORMATS, renderer = RENDERERS[0]):
 		#Plot the isopleths and garnet in
 		#numError is the amount of lines beyond the "middle line" (max of 2)
+		#The figure is saved once for each file extension in formats
+		#renderer is how the lines are drawn, see RENDERERS
 		
-		#First we can plot the Garnet in curve from the first Plt
-		grtIn = self.pltList[0].getLines("N")
+		with Profiler.timePhase("plotIsos"):
+			isoList = self.selectIsos(numError)
+			if not all(isDirectSvg(figFormat, renderer) for figFormat in formats):
+				self.drawIsos(isoList, renderer)
+		for figFormat in formats:
+			saveName = FileIndex.isoFigName(self.sampleName, self.stage, figFormat)
+			with Profiler.timePhase("savefig", saveName):
+				if isDirectSvg(figFormat, renderer):
+					self.isoSvg(isoList).save(os.path.join(saveDir, saveName))
+				else:
+					self.isoFig.savefig(os.path.join(saveDir, saveName))
+		if self.isoFig is not None:
+			self.releaseFigure(self.isoFig, self.isoAx)
+			self.isoFig = None
+			self.isoAx = None
+
+	def selectIsos(self, numError = 0):
+		#Returns a list of (line, colour, line style, label) for the garnet in and every isopleth to be drawn, in drawing order
+		#Also keeps the middle line of each member in self.midLines
 
-		for line in grtIn:
-			x, y = line.PTline.xy
-			#print("Plotting " + line.leftSide)
-			self.isoAx.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2, label="Garnet In")
+		#First we can plot the Garnet in curve from the first Plt
+		isoList = []
+		for line in self.pltList[0].getLines("N"):
+			isoList.append((line, "black", "-", "Garnet In"))
 		#labelLines(self.isoAx.get_lines(), zorder = 2.5)
 		
 		self.midLines = []
@@ -107,8 +169,6 @@ class PlotStage():
 				#Will plot the center line as a solid line and if the options are chosen
 				#Plots +- 5% as dashed lines and +-10% as dotted lines
 				if valNum >= MID_LINE - numError and valNum <= MID_LINE + numError:
-					x, y = line.PTline.xy
-
 					thisLineStyle = "-"
 					if valNum == MID_LINE - 2 or valNum== MID_LINE + 2:
 						thisLineStyle = ":"
@@ -116,49 +176,150 @@ class PlotStage():
 						thisLineStyle = "--"
 					elif valNum == MID_LINE:
 						self.midLines.append(line)
-					#print("Plotting " + line.leftSide)
 					thisLabel = GRT_LABELS[i] + " = " + line.leftSide
-					self.isoAx.plot(x, y, color = COLOURS[i], marker = None, linestyle = thisLineStyle, markersize = 7, linewidth = 2, label=thisLabel)	
-				
-				
-		self.isoAx.legend(fontsize = 14, loc = 'upper right')
-		saveName = self.sampleName + "_Stage" + str(self.stage) + ".svg"
-		self.isoFig.show()
-		self.isoFig.savefig(os.path.join(saveDir, saveName))
-
-
-	def plotPhase(self, saveDir):
+					isoList.append((line, COLOURS[i], thisLineStyle, thisLabel))
+		return isoList
+
+	def groupIsos(self, isoList):
+		#Returns {(colour, line style): list of coordinate arrays} in drawing order
+		groups = {}
+		for line, colour, lineStyle, label in isoList:
+			groups.setdefault((colour, lineStyle), []).append(line.getCoords())
+		return groups
+
+	def drawIsos(self, isoList, renderer = RENDERERS[0]):
+		#Draws the lines of selectIsos onto the isopleth figure
+		if self.isoFig is None:
+			self.isoFig, self.isoAx = self.makeFigure()
+		if renderer == RENDERERS[1]:
+			for line, colour, lineStyle, label in isoList:
+				x, y = line.PTline.xy
+				self.isoAx.plot(x, y, color = colour, marker = None, linestyle = lineStyle, markersize = 7, linewidth = 2, label = label)
+			self.isoAx.legend(fontsize = 14, loc = 'upper right')
+		else:
+			#One LineCollection for each colour and line style, the legend still gets an entry for every line
+			from matplotlib.lines import Line2D
+			handles = [Line2D([], [], color = colour, linestyle = lineStyle, linewidth = 2, label = label) for line, colour, lineStyle, label in isoList]
+			for (colour, lineStyle), segments in self.groupIsos(isoList).items():
+				self.isoAx.add_collection(lineCollection(segments, colour, lineStyle), autolim = False)
+			if len(handles) > 0:
+				self.isoAx.legend(handles = handles, fontsize = 14, loc = 'upper right')
+
+	def isoSvg(self, isoList):
+		#Returns an SvgWriter.SvgPlot of the lines of selectIsos
+		svgPlot = self.makeSvg()
+		for (colour, lineStyle), segments in self.groupIsos(isoList).items():
+			svgPlot.addLines(segments, colour, lineStyle)
+		for line, colour, lineStyle, label in isoList:
+			svgPlot.addLegendEntry(label, colour, lineStyle)
+		return svgPlot
+
+
+	def plotPhase(self, saveDir, formats = FIG_FORMATS, engine = POLY_ENGINES[0], areaMin = AREA_MIN, fillOp = FILL_OPTIONS[0], renderer = RENDERERS[0]):
 		#Plots the phase diagram for this stage
+		#The figure is saved once for each file extension in formats
+		#engine is the method used to build the fields, see PltParser.getPolys
+		#areaMin and fillOp are passed on to DomPoly.plotPoly
+		#renderer is how the fields are drawn, see RENDERERS
 
 		#Temporary test plotting lines
-		self.phasePlt.getPolys()
+		with Profiler.timePhase("getPolys", self.phasePlt.fileName):
+			self.phasePlt.getPolys(engine)
 		# for line in self.phasePlt.domLines:
 		# 	x, y = line.PTline.xy
 		# 	self.phaseAx.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
-		count = 0
-		csvName = self.sampleName + "_Stage" + str(self.stage)+"_PhaseList.csv"
+		csvName = FileIndex.phaseListName(self.sampleName, self.stage)
 		
 		try:
-			csvFile = open(os.path.join(saveDir,csvName), 'w')
+			csvWriter = PhaseCsv.PhaseCsvWriter(os.path.join(saveDir,csvName))
 		except:
 			print("Issue making file " + csvName)
 			exit()
-		csvFile.write("Field,PhaseString,Phases")
-		for phase in PHASES:
-			csvFile.write(",")
-		csvFile.write("Valid Polygon,Coordinates\n")
-		for poly in self.phasePlt.polyList:
-			# if count <13:
-			poly.plotPoly(self.phaseAx, count, csvFile,areaMin = 2000, fillOp = "barrovian")
-			count += 1
-
+		with Profiler.timePhase("plotPhase"):
+			if renderer == RENDERERS[1]:
+				if self.phaseFig is None:
+					self.phaseFig, self.phaseAx = self.makeFigure()
+				count = 0
+				for poly in self.phasePlt.polyList:
+					# if count <13:
+					poly.plotPoly(self.phaseAx, count, csvWriter,areaMin = areaMin, fillOp = fillOp)
+					count += 1
+
+				for line in self.phasePlt.failedPolys:
+					x, y = line.PTline.xy
+					self.phaseAx.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
+			else:
+				pieces = self.collectPhase(csvWriter, areaMin, fillOp)
+				if not all(isDirectSvg(figFormat, renderer) for figFormat in formats):
+					self.drawPhaseCollections(pieces)
+		csvWriter.close()
+		for figFormat in formats:
+			saveName = FileIndex.phaseFigName(self.sampleName, self.stage, figFormat)
+			with Profiler.timePhase("savefig", saveName):
+				if isDirectSvg(figFormat, renderer):
+					self.phaseSvg(pieces).save(os.path.join(saveDir, saveName))
+				else:
+					self.phaseFig.savefig(os.path.join(saveDir, saveName))
+		if self.phaseFig is not None:
+			self.releaseFigure(self.phaseFig, self.phaseAx)
+			self.phaseFig = None
+			self.phaseAx = None
+
+	def writePhaseList(self, saveDir, engine = POLY_ENGINES[0], areaMin = AREA_MIN):
+		#Builds the fields and writes the PhaseList csv of plotPhase without drawing anything
+		#Returns the path of the csv
+		with Profiler.timePhase("getPolys", self.phasePlt.fileName):
+			self.phasePlt.getPolys(engine)
+		csvName = os.path.join(saveDir, FileIndex.phaseListName(self.sampleName, self.stage))
+		with Profiler.timePhase("writePhaseList", csvName):
+			PhaseCsv.writePhaseList(csvName, self.phasePlt.polyList, areaMin)
+		return csvName
+
+	def collectPhase(self, csvWriter, areaMin = AREA_MIN, fillOp = FILL_OPTIONS[0]):
+		#Gathers what is drawn for the fields and adds the same csv rows as DomPoly.plotPoly to csvWriter
+		#Returns a dictionary of the "faces" to fill with their "faceColours", the "outlines" of the fields and failed lines
+		#and the field numbers as "labels" of (x, y, text, colour)
+		pieces = {"faces": [], "faceColours": [], "outlines": [], "labels": []}
+		for count in range(len(self.phasePlt.polyList)):
+			poly = self.phasePlt.polyList[count]
+			index = count + 1
+			fillColour, textColour = fieldColours(poly.phases, fillOp)
+			for part in poly.getParts():
+				ring = np.asarray(part.exterior.coords)
+				if fillColour is not None:
+					pieces["faces"].append(ring)
+					pieces["faceColours"].append(fillColour)
+				pieces["outlines"].append(ring)
+				if part.area >= areaMin:
+					textPt = part.representative_point()
+					pieces["labels"].append((textPt.x, textPt.y, str(index), textColour))
+					csvWriter.addField(index, poly, part)
 		for line in self.phasePlt.failedPolys:
-			x, y = line.PTline.xy
-			self.phaseAx.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
-		saveName = self.sampleName + "_Stage" + str(self.stage) + "_Phase.svg"
-		csvFile.close()
-		self.phaseFig.show()
-		self.phaseFig.savefig(os.path.join(saveDir, saveName))
+			pieces["outlines"].append(line.getCoords())
+		return pieces
+
+	def drawPhaseCollections(self, pieces):
+		#Draws the fields of collectPhase as one PolyCollection of fills under one LineCollection of outlines
+		#Fills are patches and outlines lines so plotPoly draws every fill under every outline as well
+		from matplotlib.collections import PolyCollection
+		if self.phaseFig is None:
+			self.phaseFig, self.phaseAx = self.makeFigure()
+		if len(pieces["faces"]) > 0:
+			#ax.fill gives each patch an edge of its own colour
+			self.phaseAx.add_collection(PolyCollection(pieces["faces"], facecolors = pieces["faceColours"], edgecolors = pieces["faceColours"], linewidths = 1, zorder = 1), autolim = False)
+		if len(pieces["outlines"]) > 0:
+			self.phaseAx.add_collection(lineCollection(pieces["outlines"], "black", "-"), autolim = False)
+		for textX, textY, text, textColour in pieces["labels"]:
+			self.phaseAx.text(textX, textY, text, fontsize = 10, color = textColour, horizontalalignment = 'center', verticalalignment = 'center')
+
+	def phaseSvg(self, pieces):
+		#Returns an SvgWriter.SvgPlot of the fields of collectPhase
+		svgPlot = self.makeSvg()
+		svgPlot.addPolys(pieces["faces"], pieces["faceColours"])
+		svgPlot.addLines(pieces["outlines"], "black", "-")
+		for textX, textY, text, textColour in pieces["labels"]:
+			svgPlot.addText(textX, textY, text, textColour)
+		return svgPlot
 
 
 	def getIntersection(self):
@@ -0,0 +1,86 @@
+#Functions for keeping parsed plt files on disk as npz archives
+#A cached file stores everything PltParser reads plus the joined DomLines
+#so a warm run does not need to touch the text at all
+#Entries are keyed on the path and isPhase and thrown out when the source mtime or size changes
+
+from DomLine import DomLine
+import numpy as np
+import hashlib
+import os
+import zipfile
+
+CACHE_VERSION = 2 #Bump this whenever the stored layout or the parsing rules change
+
+def cachePath(fileName, isPhase, cacheDir):
+	#Each source file gets its own archive named after a hash of its absolute path
+	key = os.path.abspath(fileName) + "|" + str(bool(isPhase))
+	return os.path.join(cacheDir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npz")
+
+def sourceStamp(fileName):
+	#The mtime and size that a cache entry has to match to still be valid
+	fileStat = os.stat(fileName)
+	return fileStat.st_mtime_ns, fileStat.st_size
+
+def loadParsed(parser, fileName, isPhase, cacheDir):
+	#Fills in parser from the cache
+	#Returns False if there is no usable entry, in which case parser is left untouched
+	thisPath = cachePath(fileName, isPhase, cacheDir)
+	try:
+		mtime, size = sourceStamp(fileName)
+		with np.load(thisPath, allow_pickle = False) as cached:
+			if int(cached["version"]) != CACHE_VERSION or int(cached["mtime"]) != mtime or int(cached["size"]) != size:
+				return False
+			xAx, yAx = cached["axes"].tolist()
+			bounds = cached["bounds"].tolist()
+			metadata = cached["metadata"].tolist()
+			coords = cached["coords"]
+			offsets = cached["offsets"]
+			leftSides = cached["left"].tolist()
+			rightSides = cached["right"].tolist()
+			hasRight = cached["hasRight"].tolist()
+	except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+		return False
+
+	parser.xAx = xAx
+	parser.yAx = yAx
+	parser.Tmin, parser.Tmax, parser.Pmin, parser.Pmax = bounds
+	parser.metadata = metadata
+	parser.domLines = []
+	for i in range(len(leftSides)):
+		thisDomLine = DomLine(leftSides[i], coords = coords[offsets[i]:offsets[i+1]])
+		if hasRight[i]:
+			thisDomLine.addRightSide(rightSides[i])
+		parser.domLines.append(thisDomLine)
+	parser.indexLines()
+	return True
+
+def saveParsed(parser, fileName, isPhase, cacheDir):
+	#Writes the parsed state of parser to the cache
+	#The archive is written to a temporary name first so a crashed run cant leave half a file behind
+	os.makedirs(cacheDir, exist_ok = True)
+	thisPath = cachePath(fileName, isPhase, cacheDir)
+	mtime, size = sourceStamp(fileName)
+
+	lineCoords = [line.getCoords() for line in parser.domLines]
+	offsets = np.zeros(len(lineCoords) + 1, dtype = np.int64)
+	if len(lineCoords) > 0:
+		offsets[1:] = np.cumsum([len(coords) for coords in lineCoords])
+		coords = np.concatenate(lineCoords)
+	else:
+		coords = np.empty((0,2))
+
+	tmpPath = thisPath + ".tmp"
+	with open(tmpPath, "wb") as cacheFile:
+		np.savez(cacheFile,
+			version = CACHE_VERSION,
+			mtime = mtime,
+			size = size,
+			axes = np.array([parser.xAx, parser.yAx]),
+			bounds = np.array([parser.Tmin, parser.Tmax, parser.Pmin, parser.Pmax]),
+			metadata = np.array(parser.metadata, dtype = str),
+			coords = coords,
+			offsets = offsets,
+			left = np.array([line.leftSide or "" for line in parser.domLines], dtype = str),
+			right = np.array([line.rightSide or "" for line in parser.domLines], dtype = str),
+			hasRight = np.array([line.rightSide is not None for line in parser.domLines], dtype = bool))
+	os.replace(tmpPath, thisPath)
@@ -2,199 +2,341 @@
 #Will find each "reaction" in the file and initialize them as DomLines
 #Can also connect lines that should be attached
 
-from DomLine import DomLine, EQ_THRESH, MAX_EXTRAP
+from DomLine import DomLine, EQ_THRESH, MAX_EXTRAP, T_THRESH, P_THRESH
 from DomPoly import DomPoly
+import PltCache
+import Profiler
 import re
-from shapely.geometry import Point, LineString, Polygon
-from shapely.ops import polygonize
-import copy
+from shapely.geometry import Point, LineString, box
+from shapely.ops import polygonize, unary_union
+from shapely.strtree import STRtree
+import numpy as np
 import math
-import sys
+import logging
 
 
 GRPH_CODE = "gph" #Used to remove nonexistant lines that dont conain graphite in a C saturated rock
 
 DIST_THRESH = 50 #This is the calue used as a threshold for linking lines. If the distance between endpoints exceeds this, then it will return multiple polys
+POLY_ENGINES = ["sort", "topology"] #Ways getPolys can rebuild the phase fields, see getPolys and getPolysTopo
+TOPO_TOL = 1e-6 #Relative distance (of the plot size) for treating a point as lying on a line in getPolysTopo
+
+logger = logging.getLogger(__name__)
+
+def readPlt(pltFile):
+	#Generator that walks an open plt file (or any iterable of text lines) one line at a time
+	#so that only a single reaction block is ever held in memory
+	#Yields ("header", (xAx, yAx, Tmin, Tmax, Pmin, Pmax)) first, then ("metadata", metadataList)
+	#then ("line", (ptArray, leftSide, rightSide)) for every reaction block with more than one point
+	#ptArray is an (N,2) array of T and P that can be handed straight to DomLine
+	#PltParser still keeps every DomLine before joining, the blocks of one label group can be anywhere in the file
+	textLines = iter(pltFile)
+
+	xAx = re.split(":",next(textLines))[1] #First line of the file is x-axis, expecting "L:Temperature [C]""
+	yAx = next(textLines).rstrip("\r\n") #Second line of the file is the y-axis, expecting "Pressure [bar]""
+	headLine = next(textLines).split() #Header line includes Temperature and pressure range of the plot
+	yield "header", (xAx.rstrip("\r\n"), yAx, float(headLine[0]), float(headLine[1]), float(headLine[2]), float(headLine[3]))
+
+	metadataLines = int(next(textLines).split()[0])
+	metadata = []
+	for i in range(metadataLines):
+		#Iterate through the metadataLines to record THERIN compo and database info
+		metadata.append(_labelText(next(textLines).split()))
+	yield "metadata", metadata
+
+	#The rest of the file defines the Domino lines to plot
+	#Expected sequence is as follows:
+	#2  NumPoints  0  0  0  0
+	#X1  Y1  3  X2  Y2  2  X3  Y3  2 ... X7  Y7  2
+	#X8  Y8  2  ... X14  Y14  2  and so on
+	#(X1-dx)  Y1  0  0  0LeftSide
+	#(X1+dx)  Y1  0  0  0RightSide
+	#The last two lines are more relevant for phase diagrams for X1-dx is X1 minus a very small number and X1+dx is X1 plus a very small number
+	#For isopleths the only relevant part is in the position of "LeftSide"
+	for blockLine in textLines:
+		blockSplit = blockLine.split()
+		if len(blockSplit) < 2:
+			continue
+		numPoints = int(blockSplit[1]) #Extracting NumPoints
+		if numPoints > 1:
+			numPTLines = int(numPoints/7) #Each PT line can have a maximum of 7 PT points
+			if numPoints%7 > 0:
+				numPTLines += 1
+			#Read every "T P flag" triplet of the block in one go and keep only T and P
+			ptTokens = []
+			for i in range(numPTLines):
+				ptTokens.extend(next(textLines).split())
+			ptArray = np.array(ptTokens, dtype = float).reshape(-1,3)[:,:2]
+
+			leftsideName = _labelText(next(textLines).split())
+			rightsideName = _labelText(next(textLines).split(), skipEmpty = True)
+			if len(rightsideName) == 0:
+				rightsideName = None
+			yield "line", (ptArray, leftsideName, rightsideName)
+		else:
+			for i in range(3):
+				next(textLines)
+
+def _labelText(lineSplit, skipEmpty = False):
+	#Labels start at the fifth column, glued to a single digit flag, and can be several words long
+	#These conditionals are so text doesnt get split up if the label is a group of phases
+	labelText = ""
+	for i in range(0, len(lineSplit)):
+		if i == 4:
+			if not skipEmpty or len(lineSplit[i]) > 1: #Wont add a rightside if the label is empty
+				labelText += lineSplit[i][1:]
+		elif i > 4:
+			labelText +=" " + lineSplit[i]
+	return labelText
+
+def makeDomLine(ptArray, leftSide, rightSide, isPhase = False):
+	#Builds a DomLine from a "line" record of readPlt
+	#Returns None for lines that PltParser throws away
+	thisDomLine = DomLine(leftSide, coords = ptArray)
+	thisDomLine.addRightSide(rightSide)
+	#Check if the line is 2 points if the two points are close enough to ignore
+	#I do this because of errors that crop up with little baby lines such as going in the wrong direction
+	if len(ptArray) == 2:
+		x1, y1 = ptArray[0]
+		x2, y2 = ptArray[1]
+		if abs(x1-x2) <= 0.1 and abs(y1-y2) <= 1:
+			return None
+	if isPhase and not (GRPH_CODE in thisDomLine.leftSide and GRPH_CODE in thisDomLine.rightSide):
+		return None
+	return thisDomLine
+
+def _gridCell(pt):
+	#Cell of the endpoint grid, cells are one join tolerance wide so a match is always in a neighbouring cell
+	return (math.floor(pt[0]/T_THRESH), math.floor(pt[1]/P_THRESH))
+
+def _isClose(pt1, pt2):
+	#Same tolerance test as DomLine.joinLine
+	return abs(pt1[0] - pt2[0]) < T_THRESH and abs(pt1[1] - pt2[1]) < P_THRESH
+
+def _labelKey(label):
+	#Sort key for a side label that puts None first
+	return (label is not None, label or "")
+
+def _nearestOnLine(coords, pt):
+	#Distance from pt to the polyline coords, the index of the closest segment and the closest point on it
+	if len(coords) == 1:
+		return np.hypot(*(coords[0] - pt)), 0, coords[0]
+	segStart = coords[:-1]
+	segVec = coords[1:] - segStart
+	segLen = (segVec**2).sum(axis = 1)
+	along = np.clip(((pt - segStart)*segVec).sum(axis = 1)/np.where(segLen > 0, segLen, 1), 0, 1)
+	nearPts = segStart + along[:,None]*segVec
+	dists = np.hypot(nearPts[:,0] - pt[0], nearPts[:,1] - pt[1])
+	segIndex = int(np.argmin(dists))
+	return dists[segIndex], segIndex, nearPts[segIndex]
+
+class _GeomTree:
+	#An STRtree over a list of geometries, some of which can be None, that gives back where each one is in the list
+	#so every line or face is only compared with the ones around it instead of all of them
+
+	def __init__(self, geomList):
+		self.used = [i for i in range(len(geomList)) if geomList[i] is not None]
+		self.positions = {id(geomList[i]): i for i in self.used}
+		self.tree = STRtree([geomList[i] for i in self.used])
+		#(minx, miny, maxx, maxy) around all of them
+		allBounds = np.array([geomList[i].bounds for i in self.used]).reshape(-1,4)
+		self.bounds = np.concatenate((allBounds[:,:2].min(axis = 0, initial = np.inf), allBounds[:,2:].max(axis = 0, initial = -np.inf)))
+
+	def query(self, geom):
+		#Indexes in geomList of the geometries whose bounding boxes meet that of geom, in order
+		#shapely 2 returns their positions in the tree, older versions the geometries themselves
+		return sorted(self.positions[id(found)] if hasattr(found, "geom_type") else self.used[int(found)] for found in self.tree.query(geom))
+
+def _coordsGeoms(coordsList):
+	#LineStrings of the coordinate arrays for a _GeomTree, None for missing lines and single points
+	return [None if coords is None or len(coords) < 2 else LineString(coords) for coords in coordsList]
+
+def _rayHit(coordsList, lineIndex, pt, atEnd, lineTree, grown = ()):
+	#Extends the end pt of coordsList[lineIndex] in the direction of its last (or first) segment, like DomLine.extrapLine
+	#Returns (index in coordsList of the line it runs into first, index of the segment hit, the hit point) or None if it never meets another line
+	#lineTree is a _GeomTree of coordsList as it was built, lines in grown have been extended since and are always tested
+	#The ray is searched in lengths growing from one tolerance, so only the lines near it are tested when it runs into one close by
+	coords = coordsList[lineIndex]
+	if atEnd:
+		coords = coords[::-1]
+	moved = np.nonzero(np.any(coords != pt, axis = 1))[0]
+	if len(moved) == 0:
+		return None
+	direction = pt - coords[moved[0]]
+	tLimit = 1/np.hypot(*direction)
+	searched = set()
+	best = None
+	bestT = np.inf
+	while True:
+		rayEnd = pt + tLimit*direction
+		near = set(lineTree.query(LineString([pt, rayEnd]))) | set(grown)
+		for j in sorted(near - searched):
+			searched.add(j)
+			if j == lineIndex or coordsList[j] is None or len(coordsList[j]) < 2:
+				continue
+			segStart = coordsList[j][:-1]
+			segVec = coordsList[j][1:] - segStart
+			toSeg = segStart - pt
+			denom = direction[0]*segVec[:,1] - direction[1]*segVec[:,0]
+			safeDenom = np.where(denom == 0, 1, denom)
+			t = (toSeg[:,0]*segVec[:,1] - toSeg[:,1]*segVec[:,0])/safeDenom
+			u = (toSeg[:,0]*direction[1] - toSeg[:,1]*direction[0])/safeDenom
+			hits = np.nonzero((denom != 0) & (t > 0) & (u >= 0) & (u <= 1))[0]
+			if len(hits) > 0:
+				segIndex = hits[np.argmin(t[hits])]
+				if t[segIndex] < bestT:
+					bestT = t[segIndex]
+					best = (j, int(segIndex), pt + t[segIndex]*direction)
+		#Every line the ray can meet up to tLimit has been tested, anything past it is found by a longer search
+		if best is not None and bestT <= tLimit:
+			return best
+		if not (lineTree.bounds[0] <= rayEnd[0] <= lineTree.bounds[2] and lineTree.bounds[1] <= rayEnd[1] <= lineTree.bounds[3]):
+			#The ray has left every line behind
+			return best
+		tLimit *= 4
+
+def joinGroup(lineGroup):
+	#Joins the touching lines of one group using a grid of line endpoints
+	#Gives exactly the lines of the old approach of calling DomLine.joinLine on every pair and rescanning after each join
+	#That approach went through the group in order and for every other line tested end to start, end to end and start to end
+	#Every failed test left the tested line reversed, so how a line is oriented depends on how many scans have gone over it
+	#Here only lines with an endpoint near the current line are actually tested,
+	#and the orientation of the rest is worked out from the number of scans that would have passed over them
+	numLines = len(lineGroup)
+	baseCoords = [line.getCoords() for line in lineGroup]
+	scanRef = [0]*numLines #Number of scans done when baseCoords was recorded
+	alive = [True]*numLines
+	lineEnds = [None]*numLines
+
+	grid = {}
+	def addEnds(index):
+		lineEnds[index] = (_gridCell(baseCoords[index][0]), _gridCell(baseCoords[index][-1]))
+		for cell in lineEnds[index]:
+			grid.setdefault(cell, set()).add(index)
+
+	def removeEnds(index):
+		for cell in lineEnds[index]:
+			grid[cell].discard(index)
+
+	def nearLines(pts):
+		near = set()
+		for pt in pts:
+			cellX, cellY = _gridCell(pt)
+			for dx in (-1, 0, 1):
+				for dy in (-1, 0, 1):
+					near.update(grid.get((cellX + dx, cellY + dy), ()))
+		return near
+
+	def currentCoords(index, numScans):
+		#Every scan since scanRef tested and reversed this line once
+		if (numScans - scanRef[index])%2 == 1:
+			return baseCoords[index][::-1]
+		return baseCoords[index]
+
+	for index in range(numLines):
+		addEnds(index)
+
+	numScans = 0
+	for j in range(numLines):
+		if not alive[j]:
+			continue
+		thisCoords = currentCoords(j, numScans)
+		removeEnds(j)
+		didJoin = True
+		while didJoin: #Keep scanning the group until a scan makes no joins
+			didJoin = False
+			lastTested = -1
+			foundJoin = True
+			while foundJoin:
+				foundJoin = False
+				candidates = sorted(k for k in nearLines((thisCoords[0], thisCoords[-1])) if k > lastTested and alive[k])
+				for k in candidates:
+					lastTested = k
+					toJoin = currentCoords(k, numScans)
+					if _isClose(thisCoords[-1], toJoin[0]):
+						thisCoords = np.concatenate((thisCoords, toJoin))
+					elif _isClose(thisCoords[-1], toJoin[-1]):
+						thisCoords = np.concatenate((thisCoords, toJoin[::-1]))
+					elif _isClose(thisCoords[0], toJoin[-1]):
+						thisCoords = np.concatenate((thisCoords[::-1], toJoin[::-1]))
+					else:
+						continue
+					alive[k] = False
+					removeEnds(k)
+					didJoin = True
+					foundJoin = True
+					break
+			numScans += 1
+		baseCoords[j] = thisCoords
+		scanRef[j] = numScans
+		addEnds(j)
+
+	joinedLines = []
+	for index in range(numLines):
+		if alive[index]:
+			thisCoords = currentCoords(index, numScans)
+			if thisCoords is not lineGroup[index].getCoords():
+				lineGroup[index].setCoords(thisCoords)
+			joinedLines.append(lineGroup[index])
+	return joinedLines
 
 class PltParser:
 
-	def __init__(self, fileName, isPhase = False):
+	def __init__(self, fileName, isPhase = False, cacheDir = None):
+		#If cacheDir is given the parsed and joined lines are read from and written to a cache there
+		self.axes = None
+		self.fileName = fileName
+		if cacheDir is not None:
+			with Profiler.timePhase("cacheLoad", fileName):
+				isCached = PltCache.loadParsed(self, fileName, isPhase, cacheDir)
+			if isCached:
+				return
+
 		try:
 			pltFile = open(fileName, 'r')
 		except:
 			print("File " + fileName + " not found.")
 			exit()
 
-
-
-		rawText = pltFile.read()
-		textLines = rawText.splitlines()
-
-		self.xAx = re.split(":",textLines[0])[1] #First line of the file is x-axis, expecting "L:Temperature [C]""
-		self.yAx = textLines[1] #Second line of the file is the y-axis, expecting "Pressure [bar]""
-		headLine = textLines[2].split() #Header line includes Temperature and pressure range of the plot
-		self.Tmin = float(headLine[0]) 
-		self.Tmax = float(headLine[1])
-		self.Pmin = float(headLine[2])
-		self.Pmax = float(headLine[3])
-		metadataLines = int(textLines[3].split()[0])
 		self.metadata = []
-		for i in range (4,metadataLines + 4):
-			#Iterate through the metadataLines to record THERIN compo and database info
-			nextLineSplit = textLines[i].split()
-			thisMeta = ""
-			#These conditionals are so that the text does not get split up
-			for j in range(0, len(nextLineSplit)):
-				if j == 4:
-					thisMeta += nextLineSplit[j][1:]
-				elif j > 4:
-					thisMeta +=" " + nextLineSplit[j]
-			self.metadata.append(thisMeta)
-		
-		nextLineNum = 4 + metadataLines
-		#The rest of the file defines the Domino lines to plot
-		#Expected sequence is as follows:
-		#2  NumPoints  0  0  0  0
-		#X1  Y1  3  X2  Y2  2  X3  Y3  2 ... X7  Y7  2
-		#X8  Y8  2  ... X14  Y14  2  and so on
-		#(X1-dx)  Y1  0  0  0LeftSide
-		#(X1+dx)  Y1  0  0  0RightSide
-		#The last two lines are more relevant for phase diagrams for X1-dx is X1 minus a very small number and X1+dx is X1 plus a very small number
-		#For isopleths the only relevant part is in the position of "LeftSide"
-
 		self.domLines = []
-		while(nextLineNum < len(textLines)):
-			
-			numPoints = int(textLines[nextLineNum].split()[1]) #Extracting NumPoints
-			if numPoints > 1:
-				nextLineNum +=1
-				#Now extract the points
-				thisDomLine = DomLine()
-				numPTLines = int(numPoints/7) #Each PT line can have a maximum of 7 PT points
-				if numPoints%7 > 0:
-					numPTLines += 1
-				for i in range(numPTLines):
-					ptLine = textLines[nextLineNum].split()
-					for i in range(0,len(ptLine),3):
-						#Add each temperature and pressure point to the domino line
-						ti = float(ptLine[i])
-						pi = float(ptLine[i+1])
-						thisDomLine.addPT(ti,pi)
-					nextLineNum += 1
-				nextLineSplit = textLines[nextLineNum].split()
-				leftsideName = ""				
-				#These conditionals are so text doesnt get split up if LeftSide is a group of phases
-				for i in range(0, len(nextLineSplit)):
-					if i == 4:
-						leftsideName += nextLineSplit[i][1:]
-					elif i > 4:
-						leftsideName +=" " + nextLineSplit[i]
-				
-				thisDomLine.addLeftSide(leftsideName)
-				
-				nextLineNum += 1
-				nextLineSplit = textLines[nextLineNum].split()
-
-				rightsideName = ""
-
-				for i in range(0, len(nextLineSplit)):
-					if i == 4:
-						if len(nextLineSplit[i]) > 1: #Wont add a rightside if the label is empty
-							rightsideName += nextLineSplit[i][1:]
-					elif i > 4:
-						rightsideName +=" " + nextLineSplit[i]
-				if len(rightsideName) > 0:
-					thisDomLine.addRightSide(rightsideName)
-				nextLineNum += 1	
-				twoPtFlag = True 
-				#Check if the line is 2 points if the two points are close enough to ignore
-				#I do this because of errors that crop up with little baby lines such as going in the wrong direction
-				if numPoints ==2:
-					x1 = thisDomLine.PTline.coords[0][0]
-					y1 = thisDomLine.PTline.coords[0][1]
-					
-					x2= thisDomLine.PTline.coords[1][0]
-					y2 = thisDomLine.PTline.coords[1][1]
-					if abs(x1-x2) <= 0.1 and abs(y1-y2) <= 1:
-						twoPtFlag = False
-				if twoPtFlag and ( not isPhase or (GRPH_CODE in thisDomLine.leftSide and GRPH_CODE in thisDomLine.rightSide)):
-					
-					self.domLines.append(thisDomLine)
-			else:
-				nextLineNum += 4 
+		with pltFile, Profiler.timePhase("parse", fileName):
+			for kind, record in readPlt(pltFile):
+				if kind == "line":
+					thisDomLine = makeDomLine(*record, isPhase = isPhase)
+					if thisDomLine is not None:
+						self.domLines.append(thisDomLine)
+				elif kind == "header":
+					self.xAx, self.yAx, self.Tmin, self.Tmax, self.Pmin, self.Pmax = record
+				elif kind == "metadata":
+					self.metadata = record
 	
-		self.joinLines()
-
-	def sortLeft(self,low, high):
-		#Function to sort the somLines by leftSide name in alphabetical order
-		#Lets do a quick sort because thats fun
-		
-		if low < high:
-
-			i = low - 1
-			pivot = self.domLines[high].leftSide #Compare every element in list to the pivot
-			
-			for j in range(low,high):
-
-				if(self.domLines[j].leftSide == None or self.domLines[j].leftSide < pivot):
-					#Increment i by 1 if j is before pivot alphabetically
-					#Then swap element at i and j
-
-					i = i + 1
-					self.domLines[i], self.domLines[j] = self.domLines[j], self.domLines[i]
-
-			#Swap element at high and element at i + 1
-			#Putting all elements bigger in volume to left of the element at high
-			self.domLines[i+1], self.domLines[high] = self.domLines[high], self.domLines[i+1]
-
-			pi = i + 1
-			
-			self.sortLeft(low, pi-1)
-			self.sortLeft(pi+1, high)
-
-	def sortRight(self, low, high):
-		#Function to sort the somLines by leftSide name in alphabetical order
-		#Lets do a quick sort because thats fun
-		
-		if low < high:
-
-			i = low - 1
-			pivot = self.domLines[high].rightSide #Compare every element in list to the pivot
-			
-			for j in range(low,high):
-
-				if(self.domLines[j].rightSide == None or self.domLines[j].rightSide < pivot):
-					#Increment i by 1 if j is before pivot alphabetically
-					#Then swap element at i and j
-
-					i = i + 1
-					self.domLines[i], self.domLines[j] = self.domLines[j], self.domLines[i]
-
-			#Swap element at high and element at i + 1
-			#Putting all elements bigger in volume to left of the element at high
-			self.domLines[i+1], self.domLines[high] = self.domLines[high], self.domLines[i+1]
-
-			pi = i + 1
-			
-			self.sortRight(low, pi-1)
-			self.sortRight(pi+1, high)
+		with Profiler.timePhase("join", fileName):
+			self.joinLines()
+		if cacheDir is not None:
+			with Profiler.timePhase("cacheSave", fileName):
+				PltCache.saveParsed(self, fileName, isPhase, cacheDir)
+
+	def indexLines(self):
+		#Groups the domLines by their (leftSide, rightSide) labels with one stable sort
+		#Lines without a label sort before everything else, as they did with the old quicksorts
+		#self.domLines is left in group order, which is also sorted by leftSide
+		#self.rightSorted holds the same lines sorted by rightSide for the second pass of getPolys
+		#lineGroups, leftLines and rightLines map a label pair, a leftSide or a rightSide to its lines
+		self.domLines = sorted(self.domLines, key = lambda line: (_labelKey(line.leftSide), _labelKey(line.rightSide)))
+		self.lineGroups = {}
+		self.leftLines = {}
+		self.rightLines = {}
+		for line in self.domLines:
+			self.lineGroups.setdefault((line.leftSide, line.rightSide), []).append(line)
+			self.leftLines.setdefault(line.leftSide, []).append(line)
+			self.rightLines.setdefault(line.rightSide, []).append(line)
+		self.rightSorted = sorted(self.domLines, key = lambda line: _labelKey(line.rightSide))
 
 	def groupLines(self):
 		#Function to group domLines of the same type into one subarray
-		lineGroups = []
-		self.sortRight(0,len(self.domLines)-1)
-		self.sortLeft(0,len(self.domLines)-1)
-		thisGroup = [self.domLines[0]]
-
-		for i in range(1, len(self.domLines)):
-			#Checks if they have the same flags and groups them then places them in the lineGroups array
-			if self.domLines[i].leftSide == thisGroup[0].leftSide and self.domLines[i].rightSide == thisGroup[0].rightSide:
-				thisGroup.append(self.domLines[i])
-			else:
-				lineGroups.append(thisGroup)
-				thisGroup = [self.domLines[i]]
-		lineGroups.append(thisGroup)
-		return lineGroups
+		self.indexLines()
+		return list(self.lineGroups.values())
 
 	def joinLines(self):
 		#Joins all lines in a shared group
@@ -204,83 +346,46 @@ class PltParser:
 		
 		newDomLines = []
 		for i in range(len(lineGroups)):
-
-			thisGroup = copy.deepcopy(lineGroups[i])
-			j = 0
-			# print("For group "+ thisGroup[j].leftSide + " Length = " + str(len(thisGroup)))
-			#While loops to account for changing array sizes
-			while j < len(thisGroup):
-				
-				
-				didRemove = True
-				while didRemove: #Does not iterate j until it iterates the array without any matches
-					k = 0
-					didRemove = False
-
-					while k<len(thisGroup):
-						if k!= j:
-							
-							didJoin = thisGroup[j].joinLine(thisGroup[k])
-							if didJoin:
-								# print(str(j) + " and " + str(k) + " match")		
-								thisGroup.pop(k)
-
-								if k < j:
-									j -= 1
-								# print("Now " + str(j) + " and " + str(k) + " Length = " + str(len(thisGroup)))
-								didRemove = True
-							else:
-
-								# print(str(j) + " and " + str(k) + " DONT match")	
-								k += 1
-								# print("Now " + str(j) + " and " + str(k) + " Length = " + str(len(thisGroup)))
-								
-						else:
-							k += 1
-				
-				j += 1
-			newDomLines.extend(thisGroup)
+			newDomLines.extend(joinGroup(lineGroups[i]))
 		self.domLines = newDomLines
-
+		self.indexLines()
+
+	def getAxes(self):
+		#Returns the plot borders as [leftAx, rightAx, botAx, topAx]
+		#They are only built once so every DomLine caches its axis intersections against the same objects
+		if self.axes is None:
+			leftAx = LineString([(self.Tmin,self.Pmin),(self.Tmin,self.Pmax)])
+			rightAx = LineString([(self.Tmax,self.Pmin),(self.Tmax,self.Pmax)])
+			botAx = LineString([(self.Tmin,self.Pmin),(self.Tmax,self.Pmin)])
+			topAx = LineString([(self.Tmin,self.Pmax),(self.Tmax,self.Pmax)])
+			self.axes = [leftAx,rightAx,botAx,topAx]
+		return self.axes
 
 	def getLines(self, left = None, right = None):
 	#Returns a list of DomLines that have a left or right side that match left and right
 	#keep as none if one side does not matter
 
-		matchList = []
-		for line in self.domLines:
-			if right == None:
-				if line.leftSide == left:
-					matchList.append(line)
-			elif left ==None:
-				if line.rightSide == right:
-					matchList.append(line)
-			else:
-				if line.leftSide == left and line.rightSide == right:
-					matchList.append(line)
-
-		return matchList
+		if right == None:
+			return list(self.leftLines.get(left, []))
+		elif left == None:
+			return list(self.rightLines.get(right, []))
+		else:
+			return list(self.lineGroups.get((left, right), []))
 
 
-	def getPolys(self):
+	def getPolys(self, engine = POLY_ENGINES[0]):
 		#This will return any polygons that exist in the plt file
 		#Useful more for phase diagrams
+		#engine "sort" chains the lines of every field by hand, "topology" uses getPolysTopo
+		if engine == POLY_ENGINES[1]:
+			return self.getPolysTopo()
 
 		#Join matching domLines
 		self.joinLines()
-		self.sortLeft(0,len(self.domLines)-1)
 		for line in self.domLines:
-			print(line.leftSide)
-			print(line.rightSide)
-			print(line.PTline)
-			print("\n")
-		leftAx = LineString([(self.Tmin,self.Pmin),(self.Tmin,self.Pmax)])
-		rightAx = LineString([(self.Tmax,self.Pmin),(self.Tmax,self.Pmax)])
-		botAx = LineString([(self.Tmin,self.Pmin),(self.Tmax,self.Pmin)])
-		topAx = LineString([(self.Tmin,self.Pmax),(self.Tmax,self.Pmax)])
-
+			logger.debug("%s | %s: %s", line.leftSide, line.rightSide, line.PTline)
 		#Axes used for lines that dont intersect on one side
-		axes = [leftAx,rightAx,botAx,topAx]
+		axes = self.getAxes()
 
 		for line in self.domLines:
 			#Find axis intersections
@@ -288,205 +393,445 @@ class PltParser:
 
 		self.polyList = []
 		self.failedPolys = []
-		thisField = self.domLines[0].leftSide
+		lineOrder = self.domLines #Sorted by leftSide for the first pass and by rightSide for the second
+		thisField = lineOrder[0].leftSide
 		checkLeft = True
 		commonLines = []
 		addLines = True
-		print("")
 		for h in range(2):
-			for i in range(len(self.domLines)+1): #+1 because it wont run through the else statement and check right side if the lat entry is a different value
+			for i in range(len(lineOrder)+1): #+1 because it wont run through the else statement and check right side if the lat entry is a different value
 
 				#Group together all lines that have the same leftside
-				if i < len(self.domLines):
-					print("Checking line " + self.domLines[i].leftSide)
-				if checkLeft and i<len(self.domLines) and self.domLines[i].leftSide == thisField:
-					print("Matches")
-					x1 = self.domLines[i].PTline.coords[0][0]
-					y1 = self.domLines[i].PTline.coords[0][1]
+				if i < len(lineOrder):
+					logger.debug("Checking line %s", lineOrder[i].leftSide)
+				if checkLeft and i<len(lineOrder) and lineOrder[i].leftSide == thisField:
+					logger.debug("Matches")
+					x1 = lineOrder[i].PTline.coords[0][0]
+					y1 = lineOrder[i].PTline.coords[0][1]
 					
-					x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-					y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
+					x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+					y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
 					
 					if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 						#This is a conditional for the situation where a line has the same first and last point in its sequence
-						commonLines.append(self.domLines[i])
-						# commonLines.append(self.domLines[i].extrapLine(bothEnds = True))
-						print(self.domLines[i].leftSide)
-						print(self.domLines[i].PTline)
+						commonLines.append(lineOrder[i])
+						# commonLines.append(lineOrder[i].extrapLine(bothEnds = True))
+						logger.debug("%s: %s", lineOrder[i].leftSide, lineOrder[i].PTline)
 
-				elif (not checkLeft) and i <len(self.domLines) and self.domLines[i].rightSide == thisField:
+				elif (not checkLeft) and i <len(lineOrder) and lineOrder[i].rightSide == thisField:
 					#This is for the second iteration through the second forloop
 
-					hasLeft = False
-					for j in range(len(self.domLines)):
-						if self.domLines[j].leftSide == thisField:
-							hasLeft = True
+					hasLeft = thisField in self.leftLines
 
 					if hasLeft:
-						print(thisField + " is already present")
+						logger.debug("%s is already present", thisField)
 						addLines = False
 					else:
-						print(thisField + " is not present")
+						logger.debug("%s is not present", thisField)
 						addLines = True
-						x1 = self.domLines[i].PTline.coords[0][0]
-						y1 = self.domLines[i].PTline.coords[0][1]
+						x1 = lineOrder[i].PTline.coords[0][0]
+						y1 = lineOrder[i].PTline.coords[0][1]
 						
-						x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-						y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
+						x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+						y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
 						
 						if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 							#This is a conditional for the situation where a line has the same first and last point in its sequence
-							commonLines.append(self.domLines[i])
+							commonLines.append(lineOrder[i])
 
-							# commonLines.append(self.domLines[i].extrapLine(bothEnds = True))
-							print(self.domLines[i].rightSide)
-							print(self.domLines[i].PTline)
+							# commonLines.append(lineOrder[i].extrapLine(bothEnds = True))
+							logger.debug("%s: %s", lineOrder[i].rightSide, lineOrder[i].PTline)
 
 				elif addLines and (len(commonLines) > 0 or checkLeft):
 					#Once a different leftSide is reached, search through the whole array for matching rightSides and add them to the commonLines
 					if checkLeft:
 						# print("Not a match")
-						for j in range(len(self.domLines)):
-							# print("Checking line " + self.domLines[j].rightSide)
-							if self.domLines[j].rightSide == thisField:
-								# print("Matches")
-								commonLines.append(self.domLines[j])
-								# commonLines.append(self.domLines[j].extrapLine(bothEnds = True))
-								print(self.domLines[j].rightSide)
-								print(self.domLines[j].PTline)
-							# else:
-							# 	print("Not a match")
-
-					print("Number of lines = " + str(len(commonLines)))
-					sortedLines = self.sortLines(commonLines)
-
-					print("Lines in order:")
+						for line in self.rightLines.get(thisField, []):
+							commonLines.append(line)
+							# commonLines.append(line.extrapLine(bothEnds = True))
+							logger.debug("%s: %s", line.rightSide, line.PTline)
+
+					logger.debug("Number of lines = %s", len(commonLines))
+					with Profiler.timePhase("sortLines", self.fileName):
+						sortedLines = self.sortLines(commonLines)
+
+					logger.debug("Lines in order:")
 					polyPts = []
 					for group in sortedLines:
 
 						for line in group:
-							print(line.PTline)
+							logger.debug("%s", line.PTline)
 							polyPts.extend(line.PTline.coords)
 						if len(polyPts) > 2:
-							self.polyList.append(DomPoly(polyPts,thisField))
+							with Profiler.timePhase("DomPoly", self.fileName):
+								self.polyList.append(DomPoly(polyPts,thisField))
 						polyPts = []
 
-					print("\n")
 					
 
 
-					if i < len(self.domLines):
+					if i < len(lineOrder):
 						if checkLeft:
-							x1 = self.domLines[i].PTline.coords[0][0]
-							y1 = self.domLines[i].PTline.coords[0][1]
+							x1 = lineOrder[i].PTline.coords[0][0]
+							y1 = lineOrder[i].PTline.coords[0][1]
 							
-							x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-							y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
-							thisField = self.domLines[i].leftSide
+							x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+							y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
+							thisField = lineOrder[i].leftSide
 							if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 								
-								commonLines = [self.domLines[i]]
+								commonLines = [lineOrder[i]]
 							else:
 								commonLines = []
 						else:
-							thisField = self.domLines[i].rightSide
+							thisField = lineOrder[i].rightSide
 							commonLines = []
-							hasLeft = False
-							for j in range(len(self.domLines)):
-								if self.domLines[j].leftSide == thisField:
-									hasLeft = True
+							hasLeft = thisField in self.leftLines
 
 							if hasLeft:
-								print(thisField + " is already present")
+								logger.debug("%s is already present", thisField)
 								addLines = False
 							else:
-								print(thisField + " is not present")
+								logger.debug("%s is not present", thisField)
 								addLines = True
-								x1 = self.domLines[i].PTline.coords[0][0]
-								y1 = self.domLines[i].PTline.coords[0][1]
+								x1 = lineOrder[i].PTline.coords[0][0]
+								y1 = lineOrder[i].PTline.coords[0][1]
 								
-								x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-								y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
+								x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+								y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
 								
 								if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 									#This is a conditional for the situation where a line has the same first and last point in its sequence
-									commonLines.append(self.domLines[i])
+									commonLines.append(lineOrder[i])
 
-									# commonLines.append(self.domLines[i].extrapLine(bothEnds = True))
-									print(self.domLines[i].rightSide)
-									print(self.domLines[i].PTline)
+									# commonLines.append(lineOrder[i].extrapLine(bothEnds = True))
+									logger.debug("%s: %s", lineOrder[i].rightSide, lineOrder[i].PTline)
 				else:
-					if i < len(self.domLines):
+					if i < len(lineOrder):
 						if checkLeft:
-							x1 = self.domLines[i].PTline.coords[0][0]
-							y1 = self.domLines[i].PTline.coords[0][1]
+							x1 = lineOrder[i].PTline.coords[0][0]
+							y1 = lineOrder[i].PTline.coords[0][1]
 							
-							x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-							y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
-							thisField = self.domLines[i].leftSide
+							x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+							y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
+							thisField = lineOrder[i].leftSide
 							if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 								
-								commonLines = [self.domLines[i]]
-								print(self.domLines[i].leftSide)
-								print(self.domLines[i].PTline)
+								commonLines = [lineOrder[i]]
+								logger.debug("%s: %s", lineOrder[i].leftSide, lineOrder[i].PTline)
 							else:
 								commonLines = []
 						else:
-							thisField = self.domLines[i].rightSide
+							thisField = lineOrder[i].rightSide
 							commonLines = []
-							hasLeft = False
-							for j in range(len(self.domLines)):
-								if self.domLines[j].leftSide == thisField:
-									hasLeft = True
+							hasLeft = thisField in self.leftLines
 
 							if hasLeft:
-								print(thisField + " is already present")
+								logger.debug("%s is already present", thisField)
 								addLines = False
 							else:
-								print(thisField + " is not present")
+								logger.debug("%s is not present", thisField)
 								addLines = True
-								x1 = self.domLines[i].PTline.coords[0][0]
-								y1 = self.domLines[i].PTline.coords[0][1]
+								x1 = lineOrder[i].PTline.coords[0][0]
+								y1 = lineOrder[i].PTline.coords[0][1]
 								
-								x2= self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][0]
-								y2 = self.domLines[i].PTline.coords[len(self.domLines[i].PTline.coords)-1][1]
+								x2= lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][0]
+								y2 = lineOrder[i].PTline.coords[len(lineOrder[i].PTline.coords)-1][1]
 								
 								if not (abs(x1-x2) <= EQ_THRESH and abs(y1-y2) <= EQ_THRESH):
 									#This is a conditional for the situation where a line has the same first and last point in its sequence
-									commonLines.append(self.domLines[i])
+									commonLines.append(lineOrder[i])
 
-									# commonLines.append(self.domLines[i].extrapLine(bothEnds = True))
-									print(self.domLines[i].rightSide)
-									print(self.domLines[i].PTline)
-			print("Checking right side now")
+									# commonLines.append(lineOrder[i].extrapLine(bothEnds = True))
+									logger.debug("%s: %s", lineOrder[i].rightSide, lineOrder[i].PTline)
+			logger.debug("Checking right side now")
 			checkLeft = False
 			addLines = False
 			commonLines = []
-			self.sortRight(0,len(self.domLines)-1)
-			thisField = self.domLines[0].rightSide	
+			lineOrder = self.rightSorted
+			thisField = lineOrder[0].rightSide	
 
 					
 
 					
 
+	def getPolysTopo(self):
+		#Rebuilds the phase fields from the topology of all the lines at once
+		#Every reaction line and the four axes are noded together in one union and polygonized in a single pass
+		#Each face is then named by the labels its bounding reaction lines have in common
+		#A face bounded by a single line and the axes has two candidate labels, these are settled by its neighbours
+		#which must be on the other side of that line
+		#A face bounded by nothing but a single line is a loop where that line crosses itself and is never named
+		#Faces that still cant be named this way are not guessed at, their outlines go in failedPolys
+		self.joinLines()
+		self.polyList = []
+		self.failedPolys = []
+		#Faces are only kept if they are inside the plot, lines can poke out past the axes
+		plotBox = box(self.Tmin, self.Pmin, self.Tmax, self.Pmax)
+		tol = TOPO_TOL*max(self.Tmax - self.Tmin, self.Pmax - self.Pmin)
+
+		with Profiler.timePhase("snapLines", self.fileName):
+			snapped, otherLines = self.snapLines()
+		lineGeoms = []
+		for coords in snapped:
+			if coords is not None:
+				lineGeoms.append(LineString(coords))
+			else:
+				lineGeoms.append(None)
+		usedGeoms = [geom for geom in lineGeoms if geom is not None]
+		if len(usedGeoms) == 0:
+			return self.polyList
+
+		with Profiler.timePhase("polygonize", self.fileName):
+			noded = unary_union(usedGeoms + [LineString(coords) for coords in otherLines])
+			pieces = list(getattr(noded, "geoms", [noded]))
+			faces = [face for face in polygonize(pieces) if plotBox.contains(face.representative_point())]
+		if len(faces) == 0:
+			return self.polyList
+
+		#Trees of the lines and faces so every piece is only checked against the ones around it
+		lineTree = _GeomTree(lineGeoms)
+		faceTree = _GeomTree(faces)
+		faceRings = [[face.exterior] + list(face.interiors) for face in faces]
+
+		#For every piece of the noded linework find the line it came from and the (at most two) faces it bounds
+		faceSides = [[] for face in faces] #List of (leftSide, rightSide) of the lines bounding each face
+		faceSources = [set() for face in faces] #Indexes of the lines bounding each face, None for the axes and bridges
+		faceNeighbours = [[] for face in faces] #(other face, line) pairs across each bounding line
+		for piece in pieces:
+			midPt = piece.interpolate(0.5, normalized = True)
+			x, y = midPt.coords[0]
+			nearBox = box(x - tol, y - tol, x + tol, y + tol)
+
+			sourceIndex = None
+			for i in lineTree.query(nearBox):
+				if lineGeoms[i].distance(midPt) <= tol:
+					sourceIndex = i
+					break
+
+			bounded = [i for i in faceTree.query(nearBox) if any(ring.distance(midPt) <= tol for ring in faceRings[i])]
+			for i in bounded:
+				faceSources[i].add(sourceIndex)
+			if sourceIndex is None:
+				continue #A piece of an axis or a bridge
+			source = self.domLines[sourceIndex]
+			for i in bounded:
+				faceSides[i].append((source.leftSide, source.rightSide))
+			if len(bounded) == 2:
+				faceNeighbours[bounded[0]].append((bounded[1], source))
+				faceNeighbours[bounded[1]].append((bounded[0], source))
+
+		faceLabels = [None]*len(faces)
+		candidates = [set() for face in faces] #Labels every bounding line of a face has
+		for i in range(len(faces)):
+			if len(faceSides[i]) == 0 or len(faceSources[i]) == 1:
+				#A face closed off by one line alone is a loop of a line that crosses itself, not a field
+				continue
+			candidates[i] = set(faceSides[i][0])
+			for sides in faceSides[i][1:]:
+				candidates[i] &= set(sides)
+			candidates[i].discard(None)
+			if len(candidates[i]) == 1:
+				faceLabels[i] = next(iter(candidates[i]))
+
+		#Faces with two candidates take the label their neighbour across the shared line does not have
+		changed = True
+		while changed:
+			changed = False
+			for i in range(len(faces)):
+				if faceLabels[i] is not None or len(candidates[i]) != 2:
+					continue
+				for other, line in faceNeighbours[i]:
+					if faceLabels[other] == line.leftSide and line.rightSide in candidates[i]:
+						faceLabels[i] = line.rightSide
+					elif faceLabels[other] == line.rightSide and line.leftSide in candidates[i]:
+						faceLabels[i] = line.leftSide
+					if faceLabels[i] is not None:
+						changed = True
+						break
+
+		for i in range(len(faces)):
+			if faceLabels[i] is not None:
+				self.polyList.append(DomPoly(faces[i], faceLabels[i]))
+			elif len(faceSides[i]) > 0:
+				#The lines around it do not agree on a label, it is drawn as an outline like getPolys does with the lines it cant place
+				self.failedPolys.append(DomLine(coords = np.asarray(faces[i].exterior.coords)))
+		return self.polyList
+
+	def snapLines(self):
+		#Returns the coordinates of every domLine and a list of extra linework (the plot border first, then the bridges below)
+		#with the line ends tidied up so the lines node into closed fields
+		#Domino lines stop a little short of the invariant points and axes they run into, so
+		#first, ends that are within tolerance of each other are grouped into invariant points, closest first,
+		#but never both ends of the same line. Points with fewer than three lines are missing one and are put together with a close one
+		#The ends at each point are bridged by straight segments in order around it, like getPolys chains the lines of a field
+		#then any end that is still on its own is snapped onto the closest line or axis within tolerance,
+		#or failing that extended along its last segment until it runs into something, as DomLine.extrapLine does
+		#The tolerance is the same T_THRESH and P_THRESH used by joinLines and axesIntersect
+		#Closed lines, with the same first and last point, are left out (as None) like in getPolys
+		scale = np.array([T_THRESH, P_THRESH])
+		border = np.array([(self.Tmin,self.Pmin),(self.Tmax,self.Pmin),(self.Tmax,self.Pmax),(self.Tmin,self.Pmax),(self.Tmin,self.Pmin)])
+		coordsList = [line.getCoords()/scale for line in self.domLines] + [border/scale]
+		numLines = len(coordsList) - 1
+		isClosed = [np.all(np.abs(line.getCoords()[0] - line.getCoords()[-1]) <= EQ_THRESH) for line in self.domLines]
+
+		#Cluster the ends, end 2*i is the start of line i and 2*i + 1 its end
+		ends = np.array([coordsList[i][k] for i in range(numLines) for k in (0, -1)]).reshape(-1,2)
+		cluster = list(range(len(ends)))
+		clusterLines = [{i//2} for i in range(len(ends))] #Lines with an end in each cluster, kept up to date for the roots
+		def findRoot(i):
+			while cluster[i] != i:
+				cluster[i] = cluster[cluster[i]]
+				i = cluster[i]
+			return i
+		#Closest pairs of ends are joined first
+		grid = {}
+		pairs = []
+		for i in range(len(ends)):
+			if isClosed[i//2]:
+				continue
+			cellX, cellY = math.floor(ends[i][0]), math.floor(ends[i][1])
+			for dx in (-1, 0, 1):
+				for dy in (-1, 0, 1):
+					for j in grid.get((cellX + dx, cellY + dy), ()):
+						thisDist = np.hypot(*(ends[i] - ends[j]))
+						if thisDist < 1:
+							pairs.append((thisDist, j, i))
+			grid.setdefault((cellX, cellY), []).append(i)
+		for thisDist, j, i in sorted(pairs):
+			rootI, rootJ = findRoot(i), findRoot(j)
+			#Both ends of a line never go on the same point, a short line between two invariant points keeps them apart
+			if rootI != rootJ and clusterLines[rootI].isdisjoint(clusterLines[rootJ]):
+				cluster[rootI] = rootJ
+				clusterLines[rootJ] |= clusterLines[rootI]
+		def getMembers():
+			members = {}
+			for i in range(len(ends)):
+				if not isClosed[i//2]:
+					members.setdefault(findRoot(i), []).append(i)
+			return members
+
+		#A lone end or a point that only two lines run into is missing a line
+		#The closest pairs of these within twice the tolerance are taken as one point
+		openNodes = [group for group in getMembers().values() if len(group) <= 2]
+		nodePts = np.array([ends[group].mean(axis = 0) for group in openNodes]).reshape(-1,2)
+		grid = {}
+		pairs = []
+		for b in range(len(openNodes)):
+			cellX, cellY = math.floor(nodePts[b][0]/2), math.floor(nodePts[b][1]/2)
+			for dx in (-1, 0, 1):
+				for dy in (-1, 0, 1):
+					for a in grid.get((cellX + dx, cellY + dy), ()):
+						thisDist = np.hypot(*(nodePts[a] - nodePts[b]))
+						if thisDist < 2:
+							pairs.append((thisDist, a, b))
+			grid.setdefault((cellX, cellY), []).append(b)
+		isJoined = [False]*len(openNodes)
+		for thisDist, a, b in sorted(pairs):
+			rootA, rootB = findRoot(openNodes[a][0]), findRoot(openNodes[b][0])
+			if isJoined[a] or isJoined[b] or not clusterLines[rootA].isdisjoint(clusterLines[rootB]):
+				continue
+			cluster[rootA] = rootB
+			clusterLines[rootB] |= clusterLines[rootA]
+			isJoined[a] = isJoined[b] = True
+
+		#The ends of every point are joined up by straight segments in order around it, as getPolys does when it chains the lines of a field
+		#The small face in the middle is bounded by none of the lines so it is never named
+		bridges = []
+		alone = []
+		for group in getMembers().values():
+			groupPts = np.unique(ends[group], axis = 0)
+			if len(group) == 1:
+				alone.append(group[0])
+			elif len(groupPts) == 2:
+				bridges.append(groupPts)
+			elif len(groupPts) > 2:
+				centre = groupPts.mean(axis = 0)
+				groupPts = groupPts[np.argsort(np.arctan2(groupPts[:,1] - centre[1], groupPts[:,0] - centre[0]))]
+				bridges.append(np.concatenate((groupPts, groupPts[:1])))
+		for i in range(numLines):
+			if isClosed[i]:
+				coordsList[i] = None
+
+		#Extend lone ends onto the closest line or axis
+		#The tree is built once, lines that get longer below are kept in grown and always looked at
+		lineTree = _GeomTree(_coordsGeoms(coordsList + bridges))
+		grown = set()
+		for endIndex in alone:
+			i = endIndex//2
+			if coordsList[i] is None:
+				continue
+			atEnd = endIndex%2 == 1
+			if atEnd:
+				pt = coordsList[i][-1]
+			else:
+				pt = coordsList[i][0]
+			near = sorted(set(j for j in lineTree.query(box(pt[0] - 1, pt[1] - 1, pt[0] + 1, pt[1] + 1)) if j < len(coordsList)) | grown)
+			#Lines that already meet the other end of this line are left out, a short line would fold back onto them
+			otherEndLines = clusterLines[findRoot(endIndex ^ 1)]
+			bestDist = 1
+			best = None
+			for j in near:
+				if j == i or j in otherEndLines:
+					continue
+				thisDist, segIndex, nearPt = _nearestOnLine(coordsList[j], pt)
+				if thisDist < bestDist:
+					bestDist = thisDist
+					best = (j, segIndex, nearPt)
+			if best is None:
+				#Nothing close, carry on along the last segment until it runs into a line, the border or the segments around an invariant point
+				best = _rayHit(coordsList + bridges, i, pt, atEnd, lineTree, grown)
+			if best is None:
+				continue
+			#Even ends that already look like they touch are snapped, noding needs the points to be exactly equal
+			j, segIndex, nearPt = best
+			if j >= len(coordsList):
+				#Ran into an invariant point, the end goes onto the closest line end there
+				bridge = bridges[j - len(coordsList)]
+				nearPt = bridge[np.argmin(np.hypot(bridge[:,0] - nearPt[0], bridge[:,1] - nearPt[1]))]
+			else:
+				#Landing within tolerance of the end of the other line means running into the invariant point there
+				for endPt, endSeg in ((0, 0), (-1, len(coordsList[j]) - 2)):
+					if np.hypot(*(coordsList[j][endPt] - nearPt)) < 1:
+						nearPt = coordsList[j][endPt]
+						segIndex = endSeg
+						break
+				if not (np.array_equal(nearPt, coordsList[j][segIndex]) or np.array_equal(nearPt, coordsList[j][segIndex + 1])):
+					coordsList[j] = np.insert(coordsList[j], segIndex + 1, nearPt, axis = 0)
+			if not np.array_equal(nearPt, pt):
+				if atEnd:
+					coordsList[i] = np.concatenate((coordsList[i], [nearPt]))
+				else:
+					coordsList[i] = np.concatenate(([nearPt], coordsList[i]))
+				grown.add(i)
+
+		return [None if coords is None else coords*scale for coords in coordsList[:-1]], [coords*scale for coords in coordsList[-1:] + bridges]
+
 	def sortLines(self, lineGroup):
 		#This method will sort lines based on closeness and shared axis intersections
 		#Will return a sorted array of lines
 		
-		leftAx = LineString([(self.Tmin,self.Pmin),(self.Tmin,self.Pmax)])
-		rightAx = LineString([(self.Tmax,self.Pmin),(self.Tmax,self.Pmax)])
-		botAx = LineString([(self.Tmin,self.Pmin),(self.Tmax,self.Pmin)])
-		topAx = LineString([(self.Tmin,self.Pmax),(self.Tmax,self.Pmax)])
-		axes = [leftAx,rightAx,botAx,topAx]
+		leftAx, rightAx, botAx, topAx = self.getAxes()
 		multiSortedLines = []
 		if len(lineGroup) > 0:
-			lineGroup = copy.deepcopy(lineGroup)
+			#The lines are reversed and extended while sorting, so this works on copies of them
+			lineGroup = [line.copy() for line in lineGroup]
+			#The first and last point of every line, only lines that are not used yet are searched
+			#The ends of unused lines never change in here, so this is only built once
+			#Lines stay where they are in lineGroup and are marked in used once they are taken
+			endPts = np.array([(coords[0], coords[-1]) for coords in (line.getCoords() for line in lineGroup)])
+			used = np.zeros(len(lineGroup), dtype = bool)
+			remaining = [] #Indexes of the unused lines in order, only built for the axis cases that go through them one at a time
+			def takeLine(j):
+				#Takes the jth line of remaining and marks it as used
+				used[remaining[j]] = True
+				return lineGroup[remaining.pop(j)]
 			sortedLines = [lineGroup[0]]
 			numLines = len(lineGroup)
-			lineGroup.pop(0)
+			used[0] = True
 			for i in range(numLines-1):
 				thisLine = sortedLines[len(sortedLines)-1]
-				linkPoint = Point(thisLine.PTline.coords[len(thisLine.PTline.coords)-1])
+				linkPoint = thisLine.getCoords()[-1]
 				#Need to check the end point first to see if it intersects with an axis
 				atAxis = False
 				# print(thisLine.PTline)
@@ -497,7 +842,7 @@ class PltParser:
 						thisAx = thisLine.intersectedAx[j]
 						thisIntersec = thisLine.axIntersec[j]
 						atAxis = True
-					print(thisLine.axInterLoc[j])
+					logger.debug("Axis intersect loc: %s", thisLine.axInterLoc[j])
 				
 				# print("At axis = " + str(atAxis))
 				if atAxis:
@@ -506,11 +851,12 @@ class PltParser:
 					#Will continue this loop as long as there is another line that has two intersections with the same axis
 					#Will run at least once to find the nextLine that intersects the same axis
 					#polyPts.extend(list(thisLine.axIntersec))
+					remaining = list(np.nonzero(~used)[0])
 					numInterAx = 0
-					for j in range(len(lineGroup)):
+					for j in range(len(remaining)):
 						#Check how many other lines intersect this same axis
 						
-						nextLine = lineGroup[j]
+						nextLine = lineGroup[remaining[j]]
 
 						for k in range(len(nextLine.intersectedAx)):
 							#Check both intersectedAxes and see if they are the same as the axes of the last point added to PolyPts
@@ -521,9 +867,9 @@ class PltParser:
 					if numInterAx == 0:
 						#This triggers in the literal corner case
 						
-						for j in range(len(lineGroup)):
-							if j < len(lineGroup):
-								nextLine = lineGroup[j]
+						for j in range(len(remaining)):
+							if j < len(remaining):
+								nextLine = lineGroup[remaining[j]]
 								#if j != thisIndex:
 								for k in range(len(nextLine.intersectedAx)):
 									nextAx = nextLine.intersectedAx[k]
@@ -533,20 +879,18 @@ class PltParser:
 									if isinstance(axIntersec, Point):
 										if (nextLine.axInterLoc[k] != 0):
 											
-											nextLine.PTline.coords = list(nextLine.PTline.coords)[::-1]
-											nextLine.axesIntersect(axes)
+											nextLine.reverse()
 										#polyPts.append(nextLine.axIntersec[k].coords)
 										axCoords = list(axIntersec.coords)
 										nextLineCoords = list(nextLine.PTline.coords)
-										print(axCoords)
-										print(nextLineCoords)
+										logger.debug("Adding corner %s to the start of %s", axCoords, nextLineCoords)
 										nextLineCoords.insert(0,axCoords[0])
-										print(nextLineCoords)
-										nextLine.PTline.coords = nextLineCoords
+										#The first point stays on the same axis so the axis intersections are kept
+										nextLine.setCoords(nextLineCoords, keepAxes = True)
 										
 										sortedLines.append(nextLine)
 
-										lineGroup.pop(j)
+										takeLine(j)
 
 									#Will this throw an error if >1 axis intersection on other axes? 
 									#Not sure I have seen that before
@@ -555,10 +899,10 @@ class PltParser:
 
 					elif numInterAx == 1:
 						#this is the normal case
-						for j in range(len(lineGroup)):
+						for j in range(len(remaining)):
 						#Checks all commonLines for the same Axis Intersection
-							if j < len(lineGroup):
-								nextLine = lineGroup[j]
+							if j < len(remaining):
+								nextLine = lineGroup[remaining[j]]
 
 								for k in range(len(nextLine.intersectedAx)):
 									
@@ -566,20 +910,13 @@ class PltParser:
 									if nextLine.intersectedAx[k] == thisAx:
 									#Checks if the intersection is at the beginning or end of nextLine
 									#If its at the end then it reverses it
-										print("This line:")
-										print(thisLine.PTline)
-										#print("Axis intersect loc: " + str(thisLine.axInterLoc[lastPt]))
-										print("Next line: ")
-										print(nextLine.PTline)
-										
-										print("Axis intersect loc: " + str(nextLine.axInterLoc[k]))
+										logger.debug("This line: %s, next line: %s, axis intersect loc: %s", thisLine.PTline, nextLine.PTline, nextLine.axInterLoc[k])
 										
 										if (nextLine.axInterLoc[k] != 0):
-											nextLine.PTline.coords = list(nextLine.PTline.coords)[::-1]
-											nextLine.axesIntersect(axes)
+											nextLine.reverse()
 										sortedLines.append(nextLine)
 
-										lineGroup.pop(j)
+										takeLine(j)
 
 						
 
@@ -601,9 +938,9 @@ class PltParser:
 						bestInterVal = -1
 						bestIndex = -1
 						bestPt = -1
-						for j in range(len(lineGroup)):
+						for j in range(len(remaining)):
 							
-							nextLine = lineGroup[j]
+							nextLine = lineGroup[remaining[j]]
 							
 							for k in range(len(nextLine.intersectedAx)):
 
@@ -622,7 +959,7 @@ class PltParser:
 										bestPt = k
 						if bestLine == None:
 							#Should trigger if there is no nexthighest so will take the lowest value
-							for j in range(len(lineGroup)):
+							for j in range(len(remaining)):
 								
 								for k in range(len(nextLine.intersectedAx)):
 
@@ -642,67 +979,52 @@ class PltParser:
 
 						if bestLine != None: 
 							if bestLine.axInterLoc[bestPt] != 0:
-								bestLine.PTline.coords = list(bestLine.PTline.coords)[::-1]
-								bestLine.axesIntersect(axes)
+								bestLine.reverse()
 						
 							
 							sortedLines.append(bestLine)
 
-							lineGroup.pop(bestIndex)
+							takeLine(bestIndex)
 					
 
 				else:
 					#The normal case where you dont have an axis intersection
-					atEnd = False
-					minDistance = sys.float_info.max
-					nextIndex = 0
-
-					for j in range(len(lineGroup)):
-						nextLine = lineGroup[j]
-						firstPoint = Point(nextLine.PTline.coords[0])
-						lastPoint = Point(nextLine.PTline.coords[len(nextLine.PTline.coords)-1])
-
-						distFirst = firstPoint.distance(linkPoint)
-						distLast = lastPoint.distance(linkPoint)
-
-						#iterate the array and find the line with an the end that is closest to the last point in the last array
-						if distFirst < minDistance or distLast < minDistance:
-							if distLast < distFirst:
-								atEnd = True
-								minDistance = distLast
-							else:
-								atEnd = False
-								minDistance = distFirst
-							nextIndex = j
-
-					if len(lineGroup) > 0:
+					#Find the line with the end that is closest to the last point in the last array
+					#Ties go to the first line and to its first point
+					if not used.all():
+						offsets = endPts - linkPoint
+						dists = np.sqrt(offsets[:,:,0]*offsets[:,:,0] + offsets[:,:,1]*offsets[:,:,1])
+						nearDists = dists.min(axis = 1)
+						nearDists[used] = np.inf
+						nextIndex = int(np.argmin(nearDists))
+						atEnd = bool(dists[nextIndex,1] < dists[nextIndex,0])
+						minDistance = nearDists[nextIndex]
 						bestMatch = lineGroup[nextIndex]
 						if atEnd:
-							bestMatch.PTline.coords = list(bestMatch.PTline.coords)[::-1]
-							bestMatch.axesIntersect(axes)
+							bestMatch.reverse()
 						if minDistance > DIST_THRESH:
 							multiSortedLines.append(sortedLines)
 							sortedLines = []
-						lineGroup.pop(nextIndex)
+						used[nextIndex] = True
 						sortedLines.append(bestMatch)
 
 			multiSortedLines.append(sortedLines)
 			for group in multiSortedLines:
 				firstLine = group[0]
 				lastLine = group[len(group)-1]
-				print("Checking for corner")
+				logger.debug("Checking for corner")
 
 				#For when there is the corner case but the axis intersections are at the beginning and end of the list
 				for j in range(len(lastLine.intersectedAx)):
 					if lastLine.axInterLoc[j] != 0:
 						lastAx = lastLine.intersectedAx[j]
 						lastIntersec = lastLine.axIntersec[j]
-						print(lastIntersec)
+						logger.debug("Last line meets the axis at %s", lastIntersec)
 						for k in range(len(firstLine.intersectedAx)):
 							firstAx = firstLine.intersectedAx[k]
 
 							axIntersec = lastAx.intersection(firstAx)
-							print(axIntersec)
+							logger.debug("Axes meet at %s", axIntersec)
 							if isinstance(axIntersec, Point):
 
 							#Should only trigger if they intersect at a point
@@ -711,11 +1033,12 @@ class PltParser:
 									
 									axCoords = list(axIntersec.coords)
 									lastLineCoords = list(lastLine.PTline.coords)
-									print(axCoords)
+									logger.debug("Adding corner %s", axCoords)
 										
 									lastLineCoords.append(axCoords[0])
 						
-									lastLine.PTline.coords = lastLineCoords
+									#The last point stays on the same axis so the axis intersections are kept
+									lastLine.setCoords(lastLineCoords, keepAxes = True)
 						
 
 
@@ -0,0 +1,81 @@
+#Functions for timing the steps of processing a stage
+#Every step is recorded under a phase name (parse, join, getPolys, ...) and the file it worked on
+#with the number of calls, the total wall time and how much the phase raised the peak memory of the process
+#The peak (ru_maxrss) only ever goes up, so a phase that stays under an earlier peak shows no growth even if it used a lot of memory
+#Times are inclusive, so a phase that runs inside another (sortLines inside getPolys) is counted in both
+#Recording is only a clock read and a dictionary update so it is always on, writeJson saves a run
+
+import contextlib
+import json
+import os
+import sys
+import time
+try:
+	import resource
+except ImportError:
+	resource = None #Not available on Windows, peak memory is left out there
+
+PROFILE_VERSION = 2 #1 had the process peak at the end of each phase as peakMemory
+
+_records = {} #(phase, file name) to its record for this process
+
+def peakMemory():
+	#Peak resident memory of this process in kB, None if it cant be found
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":
+		peak = peak//1024 #Bytes on macOS, kB everywhere else
+	return peak
+
+def addTime(phaseName, fileName, seconds, maxrssGrowth = None):
+	#Adds one call of seconds to the record of phaseName on fileName
+	#maxrssGrowth is how many kB the peak memory of the process went up during the call, the largest over all calls is kept
+	if fileName is not None:
+		fileName = os.path.basename(fileName)
+	record = _records.get((phaseName, fileName))
+	if record is None:
+		record = {"phase": phaseName, "file": fileName, "calls": 0, "seconds": 0.0, "maxrssGrowth": None}
+		_records[(phaseName, fileName)] = record
+	record["calls"] += 1
+	record["seconds"] += seconds
+	if maxrssGrowth is not None:
+		record["maxrssGrowth"] = max(record["maxrssGrowth"] or 0, maxrssGrowth)
+
+@contextlib.contextmanager
+def timePhase(phaseName, fileName = None):
+	#Times the with block as one call of phaseName, fileName is the file it works on if there is one
+	startPeak = peakMemory()
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - start
+		maxrssGrowth = None
+		if startPeak is not None:
+			maxrssGrowth = peakMemory() - startPeak
+		addTime(phaseName, fileName, seconds, maxrssGrowth)
+
+def reset():
+	#Forgets everything recorded so far
+	_records.clear()
+
+def getRecords():
+	#Returns a copy of the records of this process as a list of dictionaries
+	return [dict(record) for record in _records.values()]
+
+def summarize(records):
+	#Adds up the records of every file and stage into one record per phase
+	totals = {}
+	for record in records:
+		total = totals.setdefault(record["phase"], {"calls": 0, "seconds": 0.0, "maxrssGrowth": None})
+		total["calls"] += record["calls"]
+		total["seconds"] += record["seconds"]
+		if record["maxrssGrowth"] is not None:
+			total["maxrssGrowth"] = max(total["maxrssGrowth"] or 0, record["maxrssGrowth"])
+	return totals
+
+def writeJson(path, records):
+	#Saves the records of a run along with the totals for each phase
+	with open(path, "w") as profileFile:
+		json.dump({"version": PROFILE_VERSION, "records": records, "totals": summarize(records)}, profileFile, indent = 1)
@@ -0,0 +1,238 @@
+#Checks that the phase fields of every stage still match a stored reference
+#The fields of each stage are rebuilt and written with PlotStage.writePhaseList, without drawing, and the PhaseList csv is compared to the reference csv of the same name
+#Fields are matched by their phase string (more than one field with the same string are paired by Hausdorff distance)
+#and then compared on validity, area and Hausdorff distance
+#Distances are measured with T and P both scaled to the size of the plot so the two axes count the same
+#
+#Run with e.g. python Regression.py -i TestData, by default the reference csvs are the ones next to the plt files
+#--save DIR keeps the csvs of this run so they can be used as the reference for later changes
+#--check-extrap N instead checks DomLine.extrapIntersecMany against extrapIntersec on N random pairs of lines
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import sys
+import tempfile
+from shapely.geometry import Polygon, MultiPolygon
+from shapely import affinity
+import numpy as np
+
+import DomLine
+import FileIndex
+from PltParser import POLY_ENGINES
+from PlotStage import PlotStage
+
+AREA_TOL = 1e-4 #Largest allowed change in area, relative to the reference area
+HAUSDORFF_TOL = 1e-3 #Largest allowed Hausdorff distance, relative to the size of the plot, well under the T_THRESH and P_THRESH used for joining lines
+COORD_COLUMN = 22 #Column where the coordinates start in a PhaseList row, after the index, phase string, 19 phases and validity
+EXTRAP_BOX = (0.0, 1000.0, 0.0, 10000.0) #Tmin, Tmax, Pmin, Pmax of the random lines for --check-extrap
+EXTRAP_TOL = 1e-9 #Largest allowed difference between the two extrapIntersec results, relative to the size of EXTRAP_BOX
+
+def parseField(fieldText):
+	#Turns the coordinate text of a PhaseList row back into a polygon
+	#plotPoly only strips the outer brackets of a POLYGON, anything left in brackets is a hole
+	#A MULTIPOLYGON keeps its name, each of its rings is read as its own polygon
+	rings = []
+	for ringText in re.split(r"[()]", fieldText):
+		pts = [tuple(float(value) for value in pt.split()) for pt in ringText.split(",") if len(pt.split()) == 2]
+		if len(pts) > 2:
+			rings.append(pts)
+	if fieldText.startswith("MULTI"):
+		return MultiPolygon([Polygon(ring) for ring in rings])
+	if len(rings) == 0:
+		return Polygon()
+	return Polygon(rings[0], rings[1:])
+
+def readPhaseList(fileName):
+	#Returns a list of {"index", "phases", "valid", "field"} for every row of a PhaseList csv
+	fields = []
+	with open(fileName, "r", newline = "") as csvFile:
+		reader = csv.reader(csvFile)
+		next(reader, None) #Header
+		for row in reader:
+			if len(row) <= COORD_COLUMN:
+				continue
+			#Older csvs did not quote the coordinates so they are spread over the rest of the row
+			fields.append({"index": int(row[0]), "phases": row[1], "valid": row[COORD_COLUMN - 1] == "Yes", "field": parseField(",".join(row[COORD_COLUMN:]).strip())})
+	return fields
+
+def _normalize(geom, bounds):
+	#Scales geom so the plot is a unit square
+	tMin, tMax, pMin, pMax = bounds
+	return affinity.affine_transform(geom, [1/(tMax - tMin), 0, 0, 1/(pMax - pMin), -tMin/(tMax - tMin), -pMin/(pMax - pMin)])
+
+def compareFields(refFields, newFields, bounds, areaTol = AREA_TOL, hausdorffTol = HAUSDORFF_TOL, fieldsOnly = False):
+	#Returns a list of difference messages, one per field that does not match
+	#bounds is (Tmin, Tmax, Pmin, Pmax) of the plot
+	#With fieldsOnly only missing and new fields count, the shape of matched fields is not compared
+	differences = []
+	refByName = {}
+	newByName = {}
+	for field in refFields:
+		refByName.setdefault(field["phases"], []).append(field)
+	for field in newFields:
+		newByName.setdefault(field["phases"], []).append(field)
+
+	for phases in sorted(set(refByName) | set(newByName)):
+		refList = list(refByName.get(phases, []))
+		newList = list(newByName.get(phases, []))
+		#Pair up fields with the same phases, closest first
+		pairs = []
+		for refField in refList:
+			for newField in newList:
+				distance = _normalize(refField["field"], bounds).hausdorff_distance(_normalize(newField["field"], bounds))
+				pairs.append((distance, refField["index"], newField["index"], refField, newField))
+		pairs.sort(key = lambda pair: pair[:3])
+		usedRef = set()
+		usedNew = set()
+		for distance, refIndex, newIndex, refField, newField in pairs:
+			if refIndex in usedRef or newIndex in usedNew:
+				continue
+			usedRef.add(refIndex)
+			usedNew.add(newIndex)
+			if fieldsOnly:
+				continue
+			if refField["valid"] != newField["valid"]:
+				differences.append(phases + ": valid " + str(refField["valid"]) + " became " + str(newField["valid"]))
+			refArea = refField["field"].area
+			areaChange = abs(newField["field"].area - refArea)/max(refArea, sys.float_info.min)
+			if areaChange > areaTol or distance > hausdorffTol:
+				differences.append(phases + ": area changed by %.3g%%, Hausdorff distance %.3g of the plot" % (100*areaChange, distance))
+		for refField in refList:
+			if refField["index"] not in usedRef:
+				differences.append(phases + ": missing (reference field " + str(refField["index"]) + ")")
+		for newField in newList:
+			if newField["index"] not in usedNew:
+				differences.append(phases + ": new field " + str(newField["index"]))
+	return differences
+
+def runStage(fileDir, sampleName, stageNum, saveDir, engine = POLY_ENGINES[0]):
+	#Writes the PhaseList csv of one stage and returns the (Tmin, Tmax, Pmin, Pmax) of the plot
+	thisStage = PlotStage(stageNum, fileDir, sampleName = sampleName)
+	thisStage.writePhaseList(saveDir, engine = engine)
+	phasePlt = thisStage.phasePlt
+	return phasePlt.Tmin, phasePlt.Tmax, phasePlt.Pmin, phasePlt.Pmax
+
+def checkDir(fileDir, refDir = None, saveDir = None, engine = POLY_ENGINES[0], areaTol = AREA_TOL, hausdorffTol = HAUSDORFF_TOL, fieldsOnly = False):
+	#Compares every stage in fileDir that has a reference csv in refDir (fileDir by default)
+	#If saveDir is given the csvs of this run are copied there
+	#Returns {(sampleName, stageNum): list of differences} for every stage checked
+	if refDir is None:
+		refDir = fileDir
+	results = {}
+	workDir = tempfile.mkdtemp(prefix = "frac_regression_")
+	try:
+		for unitDir, sampleName, stageNum in FileIndex.findUnits(fileDir):
+			refName = os.path.join(refDir, FileIndex.phaseListName(sampleName, stageNum))
+			if not os.path.isfile(refName) and saveDir is None:
+				continue
+			bounds = runStage(unitDir, sampleName, stageNum, workDir, engine)
+			newName = os.path.join(workDir, FileIndex.phaseListName(sampleName, stageNum))
+			if os.path.isfile(refName):
+				results[(sampleName, stageNum)] = compareFields(readPhaseList(refName), readPhaseList(newName), bounds, areaTol, hausdorffTol, fieldsOnly)
+			if saveDir is not None:
+				os.makedirs(saveDir, exist_ok = True)
+				shutil.copy(newName, os.path.join(saveDir, FileIndex.phaseListName(sampleName, stageNum)))
+	finally:
+		shutil.rmtree(workDir, ignore_errors = True)
+	return results
+
+def randomLine(rng, start = None):
+	#A line of 2 to 6 points that wanders a short way from start (a random point by default)
+	scale = np.array([EXTRAP_BOX[1] - EXTRAP_BOX[0], EXTRAP_BOX[3] - EXTRAP_BOX[2]])
+	if start is None:
+		start = np.array([EXTRAP_BOX[0], EXTRAP_BOX[2]]) + rng.uniform(0.2, 0.8, 2)*scale
+	steps = rng.normal(0, 0.05, (rng.integers(1, 6), 2))*scale
+	return DomLine.DomLine(coords = np.concatenate(([start], start + np.cumsum(steps, axis = 0))))
+
+def randomPair(rng):
+	#Two lines, either unrelated or set up for one of the odd cases of extrapIntersec:
+	#sharing an end point, parallel, overlapping or with one ending exactly on the other
+	thisLine = randomLine(rng)
+	coords = thisLine.getCoords()
+	case = rng.integers(5)
+	if case == 1:
+		otherLine = randomLine(rng, coords[rng.choice([0, -1])])
+	elif case == 2:
+		otherLine = DomLine.DomLine(coords = coords + rng.normal(0, 20, 2))
+	elif case == 3:
+		otherLine = DomLine.DomLine(coords = coords[::-1][:max(2, len(coords) - 1)])
+	elif case == 4:
+		#Starts half way along a segment of thisLine
+		j = rng.integers(len(coords) - 1)
+		otherLine = randomLine(rng, (coords[j] + coords[j + 1])/2)
+	else:
+		otherLine = randomLine(rng)
+	if rng.integers(2) == 1:
+		otherLine.reverse()
+	return thisLine, otherLine
+
+def checkExtrap(numPairs, seed = 0, extrapolRat = DomLine.EXTRAP_RATIO):
+	#Compares extrapIntersecMany with calling extrapIntersec on every pair, returns a list of differences
+	rng = np.random.default_rng(seed)
+	pairs = [randomPair(rng) for i in range(numPairs)]
+	lineList = [pair[0] for pair in pairs]
+	otherList = [pair[1] for pair in pairs]
+	tMin, tMax, pMin, pMax = EXTRAP_BOX
+	tol = EXTRAP_TOL*max(tMax - tMin, pMax - pMin)
+	manyResults = DomLine.extrapIntersecMany(lineList, otherList, tMin, tMax, pMin, pMax, extrapolRat)
+	differences = []
+	for i in range(numPairs):
+		oneLine, oneDist = lineList[i].extrapIntersec(otherList[i], tMin, tMax, pMin, pMax, extrapolRat)
+		manyLine, manyDist = manyResults[i]
+		if (oneLine is None) != (manyLine is None):
+			same = False
+		elif oneLine is None:
+			same = abs(oneDist - manyDist) <= tol*max(1, abs(oneDist))
+		else:
+			oneCoords = np.asarray(oneLine.coords)
+			manyCoords = np.asarray(manyLine.coords)
+			same = oneDist == manyDist and oneCoords.shape == manyCoords.shape and np.all(np.abs(oneCoords - manyCoords) <= tol)
+		if not same:
+			differences.append("pair " + str(i) + ": extrapIntersec gives " + str((oneLine, oneDist)) + ", extrapIntersecMany gives " + str((manyLine, manyDist)))
+	return differences
+
+def main(argv = None):
+	argParser = argparse.ArgumentParser(description = "Compare the phase fields of every stage to stored PhaseList csvs")
+	argParser.add_argument("-i", "--input", default = "TestData", help = "Directory where the plt files are stored (default TestData)")
+	argParser.add_argument("--reference", help = "Directory of the reference csvs (default the input directory)")
+	argParser.add_argument("--save", help = "Directory to copy the csvs of this run to, for use as a later reference")
+	argParser.add_argument("--engine", choices = POLY_ENGINES, default = POLY_ENGINES[0], help = "Method used to build the phase fields (default sort)")
+	argParser.add_argument("--area-tol", type = float, default = AREA_TOL, help = "Allowed relative change in area (default %g)" % AREA_TOL)
+	argParser.add_argument("--hausdorff-tol", type = float, default = HAUSDORFF_TOL, help = "Allowed Hausdorff distance as a fraction of the plot (default %g)" % HAUSDORFF_TOL)
+	argParser.add_argument("--fields-only", action = "store_true", help = "Only check that the same fields are found, e.g. for the topology engine whose fields are always valid polygons")
+	argParser.add_argument("--check-extrap", type = int, metavar = "N", help = "Instead of the stages, check DomLine.extrapIntersecMany against extrapIntersec on N random pairs of lines")
+	argParser.add_argument("--seed", type = int, default = 0, help = "Seed of the random lines for --check-extrap (default 0)")
+	args = argParser.parse_args(argv)
+
+	if args.check_extrap is not None:
+		differences = checkExtrap(args.check_extrap, args.seed)
+		print("extrapIntersecMany: " + str(args.check_extrap) + " pairs, " + str(len(differences)) + " differences")
+		for difference in differences:
+			print("  " + difference)
+		if len(differences) > 0:
+			return 1
+		return 0
+
+	results = checkDir(args.input, args.reference, args.save, args.engine, args.area_tol, args.hausdorff_tol, args.fields_only)
+	numDifferent = 0
+	for sampleName, stageNum in sorted(results):
+		differences = results[(sampleName, stageNum)]
+		if len(differences) == 0:
+			print(sampleName + " Stage " + str(stageNum) + ": matches")
+			continue
+		numDifferent += 1
+		print(sampleName + " Stage " + str(stageNum) + ": " + str(len(differences)) + " differences")
+		for difference in differences:
+			print("  " + difference)
+	if len(results) == 0:
+		print("No stages with a reference csv found")
+		return 1
+	if numDifferent > 0:
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
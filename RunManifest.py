@@ -0,0 +1,53 @@
+#Functions for keeping track of what a run has already made so a rerun only redoes what changed
+#The manifest is a json file in the output directory with an entry for each part (isopleths or phase diagram) of each stage
+#An entry holds the mtime and size of every input file, the parameters the part was made with and the files it made
+#A part is up to date if none of those changed and all of its files are still there
+
+import json
+import os
+from PltCache import sourceStamp
+
+MANIFEST_NAME = "frac_manifest.json"
+MANIFEST_VERSION = 2 #Bump this whenever a change to the code changes the output so old manifests are thrown out
+STAGE_PARTS = ["isos", "phase"] #Parts of a stage that are made and checked separately
+
+def manifestPath(outputDir):
+	return os.path.join(outputDir, MANIFEST_NAME)
+
+def unitKey(relDir, sampleName, stageNum):
+	#json keys have to be strings
+	return relDir + "|" + sampleName + "|" + str(stageNum)
+
+def loadManifest(outputDir):
+	#Returns {unit key: {part: entry}}, empty if there is no manifest or it is from another version
+	try:
+		with open(manifestPath(outputDir), "r") as manifestFile:
+			manifest = json.load(manifestFile)
+	except (OSError, ValueError):
+		return {}
+	if manifest.get("version") != MANIFEST_VERSION:
+		return {}
+	return manifest["units"]
+
+def saveManifest(outputDir, units):
+	#Written to a temporary name first so a crashed run cant leave half a file behind
+	os.makedirs(outputDir, exist_ok = True)
+	thisPath = manifestPath(outputDir)
+	with open(thisPath + ".tmp", "w") as manifestFile:
+		json.dump({"version": MANIFEST_VERSION, "units": units}, manifestFile, indent = 1, sort_keys = True)
+	os.replace(thisPath + ".tmp", thisPath)
+
+def makeEntry(inputFiles, params, outputs):
+	#inputFiles is a list of paths, params a json friendly dictionary and outputs a list of file names in the output directory
+	inputs = {}
+	for fileName in inputFiles:
+		inputs[os.path.basename(fileName)] = list(sourceStamp(fileName))
+	return {"inputs": inputs, "params": params, "outputs": sorted(outputs)}
+
+def isFresh(oldEntry, newEntry, outputDir):
+	#True if the part described by newEntry was already made with the same inputs and parameters and its files still exist
+	if oldEntry is None:
+		return False
+	if oldEntry.get("inputs") != newEntry["inputs"] or oldEntry.get("params") != newEntry["params"] or oldEntry.get("outputs") != newEntry["outputs"]:
+		return False
+	return all(os.path.isfile(os.path.join(outputDir, fileName)) for fileName in newEntry["outputs"])
@@ -0,0 +1,155 @@
+#Writes the isopleth and phase diagram figures straight to svg without matplotlib
+#The page follows the default matplotlib layout of a 12 by 10 inch figure so the files look like the ones savefig makes
+#Everything is added in data coordinates (T, P) and mapped to the page when the file is written
+#Only the standard library and numpy are used so it is cheap to import in every worker process
+
+import numpy as np
+from xml.sax.saxutils import escape
+
+FIG_SIZE = (12, 10) #Inches, the same as the PlotStage figures
+PT_PER_INCH = 72 #svg units are points, as in matplotlib
+AXES_BOX = (0.125, 0.11, 0.9, 0.88) #left, bottom, right, top of the axes as a fraction of the figure, the matplotlib defaults
+TITLE_SIZE = 16
+LABEL_SIZE = 14
+TICK_SIZE = 10
+TICK_LENGTH = 3.5
+TICK_STEPS = [1, 2, 2.5, 5, 10] #Tick spacings tried in every power of ten, as in the matplotlib AutoLocator
+MAX_TICKS = 9
+DASHES = {"-": None, "--": [3.7, 1.6], ":": [1, 1.65]} #Dash patterns for a line width of 1, scaled by the width like matplotlib
+FONT = "DejaVu Sans, Arial, sans-serif"
+
+def niceTicks(low, high, maxTicks = MAX_TICKS):
+	#Returns the tick values between low and high with the smallest round spacing that gives at most maxTicks ticks
+	if high <= low:
+		return [low]
+	magnitude = 10**np.floor(np.log10((high - low)/maxTicks))
+	for step in TICK_STEPS:
+		spacing = step*magnitude
+		first = np.ceil(low/spacing - 1e-9)*spacing
+		ticks = np.arange(first, high + spacing*1e-9, spacing)
+		if len(ticks) <= maxTicks:
+			return [float(tick) for tick in ticks]
+	return [low, high]
+
+def _tickLabel(value):
+	if float(value).is_integer():
+		return str(int(value))
+	return "%g" % value
+
+class SvgPlot:
+
+	def __init__(self, title, xLabel, yLabel, xLim, yLim, figSize = FIG_SIZE):
+		self.title = title
+		self.xLabel = xLabel
+		self.yLabel = yLabel
+		self.xLim = xLim
+		self.yLim = yLim
+		self.width = figSize[0]*PT_PER_INCH
+		self.height = figSize[1]*PT_PER_INCH
+		#Axes corners on the page, y goes down in svg
+		self.left = AXES_BOX[0]*self.width
+		self.right = AXES_BOX[2]*self.width
+		self.top = (1 - AXES_BOX[3])*self.height
+		self.bottom = (1 - AXES_BOX[1])*self.height
+		self.layers = [[], [], []] #Elements inside the axes, drawn fills then lines then text like the matplotlib zorders
+		self.legend = []
+
+	def toPage(self, coords):
+		#Maps an array of (T, P) to page coordinates
+		coords = np.asarray(coords, dtype = float)
+		x = self.left + (coords[:,0] - self.xLim[0])/(self.xLim[1] - self.xLim[0])*(self.right - self.left)
+		y = self.bottom - (coords[:,1] - self.yLim[0])/(self.yLim[1] - self.yLim[0])*(self.bottom - self.top)
+		return np.column_stack((x, y))
+
+	def _pathData(self, coords, close = False):
+		pts = self.toPage(coords)
+		pathText = "M" + " L".join("%.2f %.2f" % (x, y) for x, y in pts)
+		if close:
+			pathText += " Z"
+		return pathText
+
+	def _strokeStyle(self, colour, lineStyle, lineWidth):
+		#Solid lines get projecting caps and dashed ones butt caps, as Line2D does
+		style = 'fill="none" stroke="%s" stroke-width="%g" stroke-linejoin="round"' % (colour, lineWidth)
+		dashes = DASHES.get(lineStyle)
+		if dashes is None:
+			return style + ' stroke-linecap="square"'
+		return style + ' stroke-linecap="butt" stroke-dasharray="%s"' % ",".join("%g" % (dash*lineWidth) for dash in dashes)
+
+	def addLines(self, segments, colour, lineStyle = "-", lineWidth = 2):
+		#Adds every array of (T, P) in segments as one group of lines with the same style
+		paths = ['<path d="%s"/>' % self._pathData(coords) for coords in segments if len(coords) > 1]
+		if len(paths) > 0:
+			self.layers[1].append("<g %s>\n%s\n</g>" % (self._strokeStyle(colour, lineStyle, lineWidth), "\n".join(paths)))
+
+	def addPolys(self, rings, colours, lineWidth = 1):
+		#Adds a filled polygon for each ring with an edge of its own colour, like ax.fill
+		for ring, colour in zip(rings, colours):
+			self.layers[0].append('<path d="%s" fill="%s" stroke="%s" stroke-width="%g" stroke-linejoin="miter"/>' % (self._pathData(ring, close = True), colour, colour, lineWidth))
+
+	def addText(self, x, y, text, colour = "black", fontSize = TICK_SIZE):
+		#Adds text centred on the data point (x, y)
+		pageX, pageY = self.toPage([(x, y)])[0]
+		self.layers[2].append('<text x="%.2f" y="%.2f" fill="%s" font-size="%g" text-anchor="middle" dominant-baseline="central">%s</text>' % (pageX, pageY, colour, fontSize, escape(text)))
+
+	def addLegendEntry(self, label, colour, lineStyle = "-", lineWidth = 2):
+		self.legend.append((label, colour, lineStyle, lineWidth))
+
+	def _axesElements(self):
+		#Frame, ticks, tick labels and axis labels
+		elements = []
+		for value in niceTicks(*self.xLim):
+			x = self.toPage([(value, self.yLim[0])])[0][0]
+			elements.append('<line x1="%.2f" y1="%.2f" x2="%.2f" y2="%.2f" stroke="black" stroke-width="0.8"/>' % (x, self.bottom, x, self.bottom + TICK_LENGTH))
+			elements.append('<text x="%.2f" y="%.2f" font-size="%g" text-anchor="middle" dominant-baseline="hanging">%s</text>' % (x, self.bottom + TICK_LENGTH + 3.5, TICK_SIZE, _tickLabel(value)))
+		for value in niceTicks(*self.yLim):
+			y = self.toPage([(self.xLim[0], value)])[0][1]
+			elements.append('<line x1="%.2f" y1="%.2f" x2="%.2f" y2="%.2f" stroke="black" stroke-width="0.8"/>' % (self.left - TICK_LENGTH, y, self.left, y))
+			elements.append('<text x="%.2f" y="%.2f" font-size="%g" text-anchor="end" dominant-baseline="central">%s</text>' % (self.left - TICK_LENGTH - 3.5, y, TICK_SIZE, _tickLabel(value)))
+		elements.append('<rect x="%.2f" y="%.2f" width="%.2f" height="%.2f" fill="none" stroke="black" stroke-width="0.8"/>' % (self.left, self.top, self.right - self.left, self.bottom - self.top))
+		elements.append('<text x="%.2f" y="%.2f" font-size="%g" text-anchor="middle">%s</text>' % ((self.left + self.right)/2, self.bottom + TICK_LENGTH + 3.5 + TICK_SIZE + 4 + LABEL_SIZE, LABEL_SIZE, escape(self.xLabel.strip())))
+		yLabelX = self.left - TICK_LENGTH - 3.5 - 4*TICK_SIZE - LABEL_SIZE/2
+		yLabelY = (self.top + self.bottom)/2
+		elements.append('<text x="%.2f" y="%.2f" font-size="%g" text-anchor="middle" transform="rotate(-90 %.2f %.2f)">%s</text>' % (yLabelX, yLabelY, LABEL_SIZE, yLabelX, yLabelY, escape(self.yLabel.strip())))
+		elements.append('<text x="%.2f" y="%.2f" font-size="%g" text-anchor="middle" dominant-baseline="hanging">%s</text>' % (self.width/2, 0.02*self.height, TITLE_SIZE, escape(self.title)))
+		return elements
+
+	def _legendElements(self, fontSize = LABEL_SIZE):
+		#A box of line samples and labels in the upper right of the axes
+		if len(self.legend) == 0:
+			return []
+		rowHeight = 1.3*fontSize
+		sampleLength = 2*fontSize
+		#Only a rough width, the text is not measured
+		boxWidth = sampleLength + 1.6*fontSize + 0.6*fontSize*max(len(label) for label, colour, lineStyle, lineWidth in self.legend)
+		boxHeight = rowHeight*len(self.legend) + 0.8*fontSize
+		boxX = self.right - 0.5*fontSize - boxWidth
+		boxY = self.top + 0.5*fontSize
+		elements = ['<rect x="%.2f" y="%.2f" width="%.2f" height="%.2f" rx="3" fill="white" fill-opacity="0.8" stroke="#cccccc"/>' % (boxX, boxY, boxWidth, boxHeight)]
+		for i in range(len(self.legend)):
+			label, colour, lineStyle, lineWidth = self.legend[i]
+			y = boxY + 0.4*fontSize + rowHeight*(i + 0.5)
+			lineX = boxX + 0.5*fontSize
+			elements.append('<path d="M%.2f %.2f L%.2f %.2f" %s/>' % (lineX, y, lineX + sampleLength, y, self._strokeStyle(colour, lineStyle, lineWidth)))
+			elements.append('<text x="%.2f" y="%.2f" font-size="%g" dominant-baseline="central">%s</text>' % (lineX + sampleLength + 0.8*fontSize, y, fontSize, escape(label)))
+		return elements
+
+	def toString(self):
+		parts = ['<?xml version="1.0" encoding="utf-8" standalone="no"?>',
+			'<svg xmlns="http://www.w3.org/2000/svg" width="%gpt" height="%gpt" viewBox="0 0 %g %g" version="1.1">' % (self.width, self.height, self.width, self.height),
+			'<defs><clipPath id="axesClip"><rect x="%.2f" y="%.2f" width="%.2f" height="%.2f"/></clipPath></defs>' % (self.left, self.top, self.right - self.left, self.bottom - self.top),
+			'<rect width="100%" height="100%" fill="white"/>',
+			'<g font-family="%s">' % FONT,
+			'<g clip-path="url(#axesClip)">']
+		for layer in self.layers:
+			parts.extend(layer)
+		parts.append("</g>")
+		parts.extend(self._axesElements())
+		parts.extend(self._legendElements())
+		parts.append("</g>")
+		parts.append("</svg>")
+		return "\n".join(parts) + "\n"
+
+	def save(self, fileName):
+		with open(fileName, "w") as svgFile:
+			svgFile.write(self.toString())
@@ -1,41 +1,115 @@
 #Rethinking this
 #
+#Run with no arguments to pick the directories with dialogs
+#or headless, e.g. python main.py -i TestData -o Results --stages 0-2 --formats svg,png --workers 4
 import sys
-import easygui
 import os
-import matplotlib.pyplot as plt
-from PltParser import PltParser
-from DomLine import DomLine
-from shapely.geometry import Point, LineString, MultiLineString, Polygon
-from PlotStage import PlotStage
-from descartes import PolygonPatch
-
-inputPath = easygui.diropenbox("Choose the directory where the files are stored", default="/home/sabastien/Documents/Globus/Completed")
-
-outputPath = easygui.diropenbox("Choose the directory to save the output", default = "/home/sabastien/Documents/Carleton/Domino Diagrams/G_FRAC Results")
-# inputPath = "TestData/"
-# outputPath = inputPath
-pathNum = 0
-intersectList = []
-while True:
-	
-	thisStage = PlotStage(pathNum, inputPath)
-	if  len(thisStage.pltList) >0:
-		thisStage.plotIsos(outputPath)
-		thisStage.plotPhase(outputPath)
-		#intersectList.append(thisStage.getIntersection())
-
-		xAx = thisStage.pltList[0].xAx
-		yAx =thisStage.pltList[0].yAx
-		xMin = thisStage.pltList[0].Tmin
-		xMax = thisStage.pltList[0].Tmax
-		yMin = thisStage.pltList[0].Pmin
-		yMax = thisStage.pltList[0].Pmax
+import argparse
+import logging
+
+from BatchRun import runBatch, setupLogging
+from PltParser import POLY_ENGINES
+from PlotStage import RENDERERS, useAgg
+
+NUM_WORKERS = None #Number of stages processed at once, None uses every core
+
+def positiveInt(text):
+	#argparse type for counts that have to be at least 1
+	try:
+		value = int(text)
+	except ValueError:
+		raise argparse.ArgumentTypeError("invalid int value: " + repr(text))
+	if value < 1:
+		raise argparse.ArgumentTypeError("must be at least 1, not " + text)
+	return value
+
+def parseStages(stageText):
+	#Turns "0-2,5" into [0, 1, 2, 5]
+	#Raises ValueError for anything that is not a stage number or a range of them
+	stages = []
+	for part in stageText.split(","):
+		try:
+			if "-" in part:
+				first, last = part.split("-")
+				if int(first) > int(last):
+					raise ValueError
+				stages.extend(range(int(first), int(last) + 1))
+			elif len(part.strip()) > 0:
+				stages.append(int(part))
+		except ValueError:
+			raise ValueError("invalid stage range " + repr(part.strip()))
+	return stages
+
+def main(argv = None):
+	argParser = argparse.ArgumentParser(description = "Merge the isopleth and phase diagram plots of G_FRAC domino runs")
+	argParser.add_argument("-i", "--input", help = "Directory where the plt files are stored")
+	argParser.add_argument("-o", "--output", help = "Directory to save the output")
+	argParser.add_argument("--stages", help = "Stages to process such as 0-3 or 0,2,5 (default is every stage found)")
+	argParser.add_argument("--formats", default = "svg", help = "Comma separated figure formats (default svg)")
+	argParser.add_argument("--workers", type = positiveInt, default = NUM_WORKERS, help = "Number of stages processed at once (default is one per core)")
+	argParser.add_argument("--cache", help = "Directory for caching parsed plt files between runs")
+	argParser.add_argument("--engine", choices = POLY_ENGINES, default = POLY_ENGINES[0], help = "Method used to build the phase fields (default sort)")
+	argParser.add_argument("-r", "--recursive", action = "store_true", help = "Also process every directory under the input directory")
+	argParser.add_argument("--profile", help = "Save the time and memory used by each step of each stage to this json file")
+	argParser.add_argument("--num-error", type = int, default = 0, help = "Number of isopleth lines either side of the middle one to draw, at most 2 (default 0)")
+	argParser.add_argument("--area-min", type = float, help = "Fields smaller than this are not numbered or listed in the csv (default 2000)")
+	argParser.add_argument("--renderer", choices = RENDERERS, default = RENDERERS[0], help = "How the lines and fields are drawn, collections batches them into a few artists and svg writes svg files without matplotlib (default collections)")
+	argParser.add_argument("--force", action = "store_true", help = "Remake every stage, even the ones the manifest in the output directory says are up to date")
+	argParser.add_argument("-v", "--verbose", action = "store_true", help = "Print the debugging output of the line sorting and field building and the stages that were skipped")
+	args = argParser.parse_args(argv)
+
+	stages = None
+	if args.stages is not None:
+		try:
+			stages = parseStages(args.stages)
+		except ValueError as err:
+			argParser.error("argument --stages: " + str(err))
+	if args.input is not None and not os.path.isdir(args.input):
+		argParser.error("argument -i/--input: no such directory " + repr(args.input))
+
+	logLevel = logging.WARNING
+	if args.verbose:
+		logLevel = logging.DEBUG
+	setupLogging(logLevel)
+
+	if args.input is None or args.output is None:
+		#No directories given so ask for them, this is the only place the GUI is loaded
+		import easygui
+		inputPath = args.input
+		if inputPath is None:
+			inputPath = easygui.diropenbox("Choose the directory where the files are stored", default="/home/sabastien/Documents/Globus/Completed")
+		outputPath = args.output
+		if outputPath is None:
+			outputPath = easygui.diropenbox("Choose the directory to save the output", default = "/home/sabastien/Documents/Carleton/Domino Diagrams/G_FRAC Results")
+		if inputPath is None or outputPath is None:
+			return 1
 	else:
-		print("Does not contain stage " + str(pathNum))
-		break
-	
-	pathNum += 1
+		#Headless, nothing is ever shown
+		useAgg()
+		inputPath = args.input
+		outputPath = args.output
+	# inputPath = "TestData/"
+	# outputPath = inputPath
+
+	formats = [figFormat.strip() for figFormat in args.formats.split(",") if len(figFormat.strip()) > 0]
+	os.makedirs(outputPath, exist_ok = True)
+
+	#Every stage of every sample is processed in parallel, a failed stage does not stop the rest
+	stageErrors = runBatch(inputPath, outputPath, args.workers, cacheDir = args.cache, stages = stages, formats = formats, recursive = args.recursive, engine = args.engine, logLevel = logLevel, profilePath = args.profile,
+		numError = args.num_error, areaMin = args.area_min, renderer = args.renderer, force = args.force)
+	for fileDir, sampleName, stageNum in sorted(stageErrors, key = str):
+		unitName = "Stage " + str(stageNum)
+		if sampleName is not None:
+			unitName = sampleName + " " + unitName + " in " + fileDir
+		print(unitName + " failed:")
+		print(stageErrors[(fileDir, sampleName, stageNum)])
+	if len(stageErrors) > 0:
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
+
 # for line in myPlt.domLines:
 # 	x, y  = line.PTline.xy
 	
@@ -58,4 +132,3 @@ while True:
 # 	ixAx.add_patch(polyPatch)
 
 # 	plt.plot(x, y, color = "black", marker = None, linestyle = "-", markersize = 7, linewidth = 2)
-plt.show()
\ No newline at end of file